@@ -1,11 +1,48 @@
 import os
+import time
 import uuid
 import base64
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, url_for, g, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from PIL import Image
-import io
+from urllib.parse import urlparse
+
+import cv2
+
+# Diimport di awal supaya biaya import OpenCV/NumPy/processing tidak
+# dibayar oleh request pertama
+from processing import (
+    DEFAULT_PARAMS,
+    Pipeline,
+    cache,
+    classify_features,
+    classify_image,
+    classify_images,
+    decode_image_bytes,
+    detections_from_features,
+    draw_detection_result,
+    image_to_base64 as img_to_b64,
+    inspect_image,
+    model_status,
+    remember_decoded,
+    resize_keep_aspect,
+    warm_up,
+)
+from processing.feature_store import feature_store
+from processing.metrics import StageTimer, observe_request, observe_stages, registry
+from processing.registry import model_registry, model_info
+from processing.workers import configure_pool, pool_size, shutdown_pool, warm_up_pool
+from processing.tiles import TILE_OVERLAP, TILE_SIZE, inspect_tiled
+from jobs import STATUSES as JOB_STATUSES, CallbackRejected, JobQueue, QueueFull, check_callback_url
+from storage import (
+    JobStore,
+    ResultsStore,
+    UploadIndex,
+    link_file_once,
+    owned_step_filename,
+    step_filename,
+    write_file_once,
+)
 
 app = Flask(__name__)
 CORS(app) 
@@ -13,7 +50,11 @@ CORS(app)
 # Konfigurasi
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 PROCESSED_FOLDER = os.path.join(os.path.dirname(__file__), 'processed')
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'wood_knots.db')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'tiff'}
+# Urutan tetap untuk fallback lookup file upload lama (sebelum ada index)
+LOOKUP_EXTENSIONS = tuple(sorted(ALLOWED_EXTENSIONS))
+IMAGE_MODES = ('base64', 'url', 'none')
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
@@ -21,6 +62,26 @@ os.makedirs(PROCESSED_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 
+app.config['DATABASE_PATH'] = DATABASE_PATH
+app.config['MAX_BATCH_SIZE'] = 500
+app.config['PREVIEW_MAX_DIM'] = 512
+# Jumlah proses worker untuk ekstraksi fitur & klasifikasi (0 = nonaktif, "auto" = semua core)
+app.config['WORKER_POOL_SIZE'] = os.environ.get('WOOD_WORKER_POOL_SIZE', '0')
+# Load model + inferensi dummy saat start (WOOD_WARMUP=0 untuk menonaktifkan)
+app.config['WARMUP_ON_START'] = os.environ.get('WOOD_WARMUP', '1') != '0'
+# Interval (detik) pengecekan file model untuk hot reload (0 = nonaktif)
+app.config['MODEL_WATCH_INTERVAL'] = float(os.environ.get('WOOD_MODEL_WATCH_INTERVAL', '5'))
+# Antrean job async /api/process: kapasitas, jumlah thread worker, umur hasil (detik)
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('WOOD_JOB_QUEUE_SIZE', '64'))
+app.config['JOB_WORKERS'] = int(os.environ.get('WOOD_JOB_WORKERS', '2'))
+app.config['JOB_RESULT_TTL'] = int(os.environ.get('WOOD_JOB_RESULT_TTL', '600'))
+# Host yang boleh menjadi target callback_url (dipisah koma). Kosong = hanya
+# host dengan alamat publik (loopback, link-local, private ditolak)
+app.config['CALLBACK_ALLOWED_HOSTS'] = {
+    host.strip().lower()
+    for host in os.environ.get('WOOD_CALLBACK_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+}
 
 
 def allowed_file(filename):
@@ -28,20 +89,384 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def image_to_base64(image_path):
-    """Convert image file to base64 string"""
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode('utf-8')
+def parse_image_options():
+    """
+    Baca opsi gambar tahap dari query string / body JSON.
+    
+    Returns:
+        Tuple (mode, steps). steps berupa set string ("1".."7", "result")
+        atau None untuk semua tahap.
+    """
+    options = request.get_json(silent=True) or {}
+    mode = request.args.get('images', options.get('images', 'base64'))
+    steps = request.args.get('steps', options.get('steps'))
+    if isinstance(steps, str):
+        steps = steps.split(',')
+    if steps:
+        steps = {str(step).strip() for step in steps if str(step).strip()}
+    return mode, steps or None
+
+
+def request_flag(name):
+    """Baca opsi boolean dari query string atau body JSON (?name=1)."""
+    options = request.get_json(silent=True) or {}
+    value = request.args.get(name, options.get(name, False))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def want_timings():
+    """True jika client meminta blok "timings" (?timings=1 atau body JSON)."""
+    return request_flag('timings')
+
+
+def parse_pipeline_params():
+    """
+    Baca override parameter pipeline dari body JSON ({"params": {...}}) atau
+    query string (?threshold_value=90; nama sama dengan key CONFIG).
+    
+    Returns:
+        PipelineParams (DEFAULT_PARAMS jika tidak ada override)
+    
+    Raises:
+        ValueError: Jika nama parameter tidak dikenal atau nilainya tidak valid
+    """
+    options = request.get_json(silent=True) or {}
+    overrides = options.get('params') or {}
+    if not isinstance(overrides, dict):
+        raise ValueError("params harus berupa object JSON")
+    overrides = dict(overrides)
+    for name in DEFAULT_PARAMS.to_dict():
+        if name in request.args:
+            overrides[name] = request.args[name]
+    return DEFAULT_PARAMS.replace(**overrides)
+
+
+def parse_tiling_options():
+    """
+    Baca opsi mode tile dari query string / body JSON.
+    
+    Returns:
+        Dictionary tile_size, overlap, scale untuk inspect_tiled
+    
+    Raises:
+        ValueError: Jika nilai opsi tidak valid
+    """
+    options = request.get_json(silent=True) or {}
+    
+    def option(name, cast, default):
+        value = request.args.get(name, options.get(name))
+        if value is None:
+            return default
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} harus berupa angka")
+    
+    tile_size = option('tile_size', int, TILE_SIZE)
+    overlap = option('overlap', int, TILE_OVERLAP)
+    scale = option('scale', float, 1.0)
+    if not 128 <= tile_size <= 8192:
+        raise ValueError("tile_size harus antara 128 dan 8192")
+    if not 0 <= overlap <= tile_size // 2:
+        raise ValueError("overlap harus antara 0 dan tile_size / 2")
+    if not 0 < scale <= 1:
+        raise ValueError("scale harus lebih dari 0 dan maksimal 1")
+    return {"tile_size": tile_size, "overlap": overlap, "scale": scale}
+
+
+def finish_timings(response, timer, include=None):
+    """Catat durasi tahap ke histogram dan tambahkan ke response jika diminta."""
+    observe_stages(timer.timings)
+    if want_timings() if include is None else include:
+        response['timings'] = timer.result()
+    return response
+
+
+def is_valid_image_id(image_id):
+    """True jika image_id berbentuk UUID seperti yang dibuat /api/upload."""
+    if not isinstance(image_id, str):
+        return False
+    try:
+        return str(uuid.UUID(image_id)) == image_id
+    except ValueError:
+        return False
+
+
+def _inside_upload_folder(path):
+    upload_folder = os.path.realpath(app.config['UPLOAD_FOLDER'])
+    return os.path.commonpath([upload_folder, os.path.realpath(path)]) == upload_folder
+
+
+def find_image_path(image_id):
+    """
+    Cari path file upload untuk image_id, None jika tidak ada atau image_id
+    tidak valid.
+    
+    Lookup memakai upload index (tanpa stat file). File lama yang diupload
+    sebelum index ada dicari sekali di folder upload lalu didaftarkan,
+    hanya jika file benar-benar berada di dalam folder upload.
+    """
+    if not is_valid_image_id(image_id):
+        return None
+    
+    entry = upload_index.get(image_id)
+    if entry is not None:
+        return entry['path']
+    
+    for ext in LOOKUP_EXTENSIONS:
+        potential_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{image_id}.{ext}")
+        if os.path.exists(potential_path) and _inside_upload_folder(potential_path):
+            upload_index.add(image_id, potential_path, filename=os.path.basename(potential_path))
+            return potential_path
+    return None
+
+
+results_store = ResultsStore(DATABASE_PATH)
+upload_index = UploadIndex(DATABASE_PATH)
+job_queue = JobQueue(
+    max_size=app.config['JOB_QUEUE_SIZE'],
+    workers=app.config['JOB_WORKERS'],
+    result_ttl=app.config['JOB_RESULT_TTL'],
+    # Status job di SQLite: polling bisa mengenai worker gunicorn mana pun
+    store=JobStore(DATABASE_PATH),
+    callback_allowed_hosts=app.config['CALLBACK_ALLOWED_HOSTS']
+)
+
+registry.collector("wood_job_queue_depth", lambda: job_queue.depth(), "gauge",
+                   "Job /api/process async yang menunggu di antrean")
+
+
+def _job_counts():
+    stats = job_queue.stats()
+    return {(("status", status),): stats[status] for status in JOB_STATUSES}
+
+
+registry.collector("wood_jobs", _job_counts, "gauge", "Job yang tersimpan per status")
+
+
+def write_step_image(image_id, name, data):
+    """Tulis JPEG tahap pipeline ke PROCESSED_FOLDER, mengembalikan nama file."""
+    filename = step_filename(image_id, name, data)
+    return write_file_once(app.config['PROCESSED_FOLDER'], filename, data)
+
+
+def _store_image(image_id, name, image):
+    """
+    Ubah nilai gambar di response menjadi path route yang disimpan.
+    
+    Data URI ditulis ke PROCESSED_FOLDER (tanpa encode ulang); URL (mode
+    images=url) sudah menunjuk ke file sehingga cukup diambil path-nya.
+    URL hasil cache bisa menunjuk ke file milik gambar identik lain; file
+    tersebut di-link ke nama milik image_id, sehingga pembersihan file
+    gambar lain tidak memutus hasil tersimpan ini.
+    """
+    if image is None:
+        return None
+    if image.startswith('data:'):
+        data = base64.b64decode(image.split(',', 1)[1])
+        return f"/processed/{write_step_image(image_id, name, data)}"
+    path = urlparse(image).path
+    filename = path.rsplit('/', 1)[-1]
+    if path.startswith('/processed/') and not filename.startswith(f"{image_id}_"):
+        filename = link_file_once(
+            app.config['PROCESSED_FOLDER'], filename,
+            owned_step_filename(image_id, name, filename)
+        )
+        return f"/processed/{filename}"
+    return path
+
+
+def _processed_files_exist(response):
+    """True jika semua file /processed/ yang dirujuk response masih ada."""
+    urls = [step['image'] for step in response['pipeline_steps']]
+    urls.append(response['detection_results']['result_image'])
+    for url in urls:
+        if not url or url.startswith('data:'):
+            continue
+        path = urlparse(url).path
+        if path.startswith('/processed/') and not os.path.exists(
+            os.path.join(app.config['PROCESSED_FOLDER'], path.rsplit('/', 1)[-1])
+        ):
+            return False
+    return True
+
+
+def _image_refs(payload):
+    refs = {step.get('image_ref') for step in payload['pipeline_steps']}
+    refs.add(payload['detection_results'].get('result_image_ref'))
+    return {ref for ref in refs if ref}
+
+
+def save_results(image_id, response):
+    """
+    Simpan hasil /api/process ke results store.
+    
+    Gambar setiap tahap ditulis ke PROCESSED_FOLDER dan hanya path-nya
+    yang disimpan di database, sehingga GET /api/results/<image_id> cukup
+    membaca database. File milik hasil sebelumnya yang tidak dipakai lagi
+    dihapus; file yang dirujuk hasil ini selalu bernama milik image_id.
+    """
+    steps = []
+    for step in response['pipeline_steps']:
+        step = dict(step)
+        step['image_ref'] = _store_image(image_id, f"step{step['step']}", step.pop('image'))
+        steps.append(step)
+    
+    detection_results = dict(response['detection_results'])
+    detection_results['result_image_ref'] = _store_image(
+        image_id, "result", detection_results.pop('result_image')
+    )
+    
+    payload = {
+        "classification": response['classification'],
+        "pipeline_steps": steps,
+        "features": response['features'],
+        "detection_results": detection_results,
+        "image_dimensions": response['image_dimensions']
+    }
+    previous = results_store.get(image_id)
+    results_store.save(image_id, payload)
+    
+    if previous is not None:
+        for ref in _image_refs(previous) - _image_refs(payload):
+            # Hanya file milik image_id ini (file gambar lain tidak pernah
+            # dirujuk langsung, lihat _store_image)
+            filename = ref.rsplit('/', 1)[-1]
+            if ref.startswith('/processed/') and filename.startswith(f"{image_id}_"):
+                try:
+                    os.remove(os.path.join(app.config['PROCESSED_FOLDER'], filename))
+                except OSError:
+                    pass
+
+
+_processing_pid = None
+
+
+def preload_processing():
+    """
+    Load model dan jalankan inferensi dummy (tanpa membuat thread/proses).
+    
+    Aman dipanggil di proses master sebelum fork (gunicorn --preload):
+    model yang sudah di-load dibagi ke semua worker lewat copy-on-write.
+    """
+    if not app.config['WARMUP_ON_START']:
+        return
+    try:
+        info = warm_up()
+        app.logger.info("Model siap dalam %.3fs (load %.3fs)", info['warmup_seconds'], info['load_seconds'])
+    except FileNotFoundError as e:
+        app.logger.warning("Warm-up dilewati: %s", e)
+
+
+def start_processing():
+    """
+    Mulai bagian processing milik proses ini: watcher model dan worker pool.
+    
+    Thread dan proses tidak ikut saat fork, sehingga fungsi ini dipanggil
+    sekali per proses server (setelah fork). Panggilan berikutnya di proses
+    yang sama tidak melakukan apa-apa.
+    
+    Returns:
+        Jumlah proses worker pool
+    """
+    global _processing_pid
+    if _processing_pid == os.getpid():
+        return pool_size()
+    _processing_pid = os.getpid()
+    # Watcher dimulai sebelum pool dibuat supaya worker ikut memantau model
+    model_registry.start_watcher(app.config['MODEL_WATCH_INTERVAL'])
+    size = configure_pool(app.config['WORKER_POOL_SIZE'])
+    if app.config['WARMUP_ON_START']:
+        warm_up_pool()
+    return size
+
+
+def configure_processing():
+    """
+    Terapkan konfigurasi app ke modul processing (ukuran worker pool dan
+    watcher model) lalu warm-up model dan worker, sehingga request pertama
+    tidak membayar biaya load model.
+    """
+    preload_processing()
+    return start_processing()
+
+
+def shutdown_processing(timeout=None):
+    """
+    Hentikan processing dengan rapi: tunggu job async yang tersisa selesai
+    (maksimal timeout detik), lalu matikan watcher model dan worker pool.
+    
+    Returns:
+        True jika semua job selesai sebelum timeout
+    """
+    drained = job_queue.drain(timeout)
+    if not drained:
+        app.logger.warning("Shutdown: masih ada job yang belum selesai setelah %ss", timeout)
+    model_registry.stop_watcher()
+    shutdown_pool(wait=True)
+    return drained
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    # Server yang tidak memanggil start_processing() per proses (selain
+    # gunicorn.conf.py) tetap mendapat watcher dan worker pool
+    if _processing_pid != os.getpid():
+        start_processing()
+
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(endpoint, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Metrik server dalam format teks Prometheus."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Wood Knots Detection API is running"})
+    return jsonify({
+        "status": "healthy",
+        "message": "Wood Knots Detection API is running",
+        "model": model_status()
+    })
 
 
 
 
+@app.route('/api/model', methods=['GET'])
+def model_endpoint():
+    """Model yang aktif (versi, metrik) dan status hot reload."""
+    return jsonify(model_registry.info())
+
+
+@app.route('/api/model/reload', methods=['POST'])
+def reload_model_endpoint():
+    """
+    Load ulang model dari file sekarang juga (tanpa menunggu watcher).
+    
+    Request yang sedang berjalan tetap memakai model lama; model baru
+    dipakai setelah selesai di-load. Worker pool memuat ulang model lewat
+    watcher masing-masing.
+    """
+    try:
+        swapped = model_registry.reload(force=request.args.get('force') == '1')
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, "reloaded": swapped, **model_registry.info()})
+
+
 @app.route('/api/classify/<image_id>', methods=['POST'])
 def classify_image_endpoint(image_id):
     """
@@ -57,25 +482,149 @@ def classify_image_endpoint(image_id):
         JSON dengan hasil klasifikasi (class_name, confidence, features)
     """
     # Cari file gambar
-    image_path = None
-    for ext in ALLOWED_EXTENSIONS:
-        potential_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{image_id}.{ext}")
-        if os.path.exists(potential_path):
-            image_path = potential_path
-            break
+    image_path = find_image_path(image_id)
     
     if not image_path:
         return jsonify({"error": "Image not found"}), 404
     
     try:
-        from processing import classify_image
-        result = classify_image(image_path)
+        params = parse_pipeline_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        timer = StageTimer()
+        result = classify_image(image_path, timer=timer, params=params)
         
         # Tambahkan image_id ke response
         result['image_id'] = image_id
         result['success'] = True
         
-        return jsonify(result)
+        return jsonify(finish_timings(result, timer))
+    except FileNotFoundError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Model belum tersedia. Silakan train model di Google Colab terlebih dahulu."
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/classify/batch', methods=['POST'])
+def classify_batch_endpoint():
+    """
+    Klasifikasi banyak gambar dalam satu request.
+    
+    Body JSON: {"image_ids": ["...", "..."]}
+    
+    Fitur semua gambar ditumpuk menjadi satu matriks sehingga model
+    Random Forest hanya dipanggil sekali untuk seluruh batch.
+    
+    Returns:
+        JSON dengan list hasil klasifikasi (urutan sama dengan image_ids)
+    """
+    data = request.get_json(silent=True) or {}
+    image_ids = data.get('image_ids')
+    
+    if not isinstance(image_ids, list) or not image_ids:
+        return jsonify({"error": "image_ids must be a non-empty list"}), 400
+    if len(image_ids) > app.config['MAX_BATCH_SIZE']:
+        return jsonify({
+            "error": f"Batch terlalu besar (maksimal {app.config['MAX_BATCH_SIZE']} gambar)"
+        }), 400
+    
+    try:
+        params = parse_pipeline_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    results = [None] * len(image_ids)
+    found_paths = []
+    found_index = []
+    for i, image_id in enumerate(image_ids):
+        if not is_valid_image_id(image_id):
+            results[i] = {"image_id": image_id, "success": False, "error": "Invalid image_id"}
+            continue
+        image_path = find_image_path(image_id)
+        if image_path:
+            found_paths.append(image_path)
+            found_index.append(i)
+        else:
+            results[i] = {"image_id": image_id, "success": False, "error": "Image not found"}
+    
+    timer = StageTimer()
+    try:
+        classifications = classify_images(found_paths, timer=timer, params=params)
+    except FileNotFoundError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Model belum tersedia. Silakan train model di Google Colab terlebih dahulu."
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+    
+    for i, classification in zip(found_index, classifications):
+        classification['image_id'] = image_ids[i]
+        classification['success'] = 'error' not in classification
+        results[i] = classification
+    
+    return jsonify(finish_timings({
+        "success": True,
+        "count": len(results),
+        "results": results
+    }, timer))
+
+
+@app.route('/api/detect/<image_id>', methods=['POST'])
+def detect_image_endpoint(image_id):
+    """
+    Fast path klasifikasi + deteksi untuk scanner produksi.
+    
+    Menjalankan pipeline minimal tanpa visualisasi (tanpa gambar tahap,
+    tanpa overlay) dan hanya mengembalikan data terstruktur.
+    
+    Dengan ?tiled=1 gambar diproses per tile pada resolusi asli (atau
+    ?scale=0.5 dst.) untuk scan papan resolusi tinggi; opsi tile_size dan
+    overlap mengatur ukuran tile.
+    
+    Args:
+        image_id: ID gambar yang sudah diupload
+        
+    Returns:
+        JSON dengan class_name, confidence, features dan detections (bbox)
+    """
+    image_path = find_image_path(image_id)
+    
+    if not image_path:
+        return jsonify({"error": "Image not found"}), 404
+    
+    tiling = None
+    try:
+        params = parse_pipeline_params()
+        if request_flag('tiled'):
+            tiling = parse_tiling_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        timer = StageTimer()
+        if tiling is not None:
+            result = inspect_tiled(image_path, timer=timer, params=params, **tiling)
+        else:
+            result = inspect_image(image_path, timer=timer, params=params)
+        
+        result['image_id'] = image_id
+        result['success'] = True
+        
+        return jsonify(finish_timings(result, timer))
     except FileNotFoundError as e:
         return jsonify({
             "success": False,
@@ -105,11 +654,25 @@ def upload_image():
         ext = filename.rsplit('.', 1)[1].lower()
         new_filename = f"{image_id}.{ext}"
         
+        # Decode sekali langsung dari buffer request
+        data = file.read()
+        img_bgr = decode_image_bytes(data)
+        if img_bgr is None:
+            return jsonify({"error": "Failed to decode image"}), 400
+        height, width = img_bgr.shape[:2]
+        
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-        file.save(filepath)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        
+        upload_index.add(image_id, filepath, filename=filename, width=width, height=height)
+        # Hasil decode dipakai langsung oleh processing berikutnya
+        remember_decoded(filepath, img_bgr)
         
-        with Image.open(filepath) as img:
-            width, height = img.size
+        # Preview diperkecil, bukan salinan file original
+        preview = img_bgr
+        if max(height, width) > app.config['PREVIEW_MAX_DIM']:
+            preview = resize_keep_aspect(img_bgr, max_dim=app.config['PREVIEW_MAX_DIM'])
         
         return jsonify({
             "success": True,
@@ -117,7 +680,7 @@ def upload_image():
             "filename": filename,
             "filepath": filepath,
             "dimensions": {"width": width, "height": height},
-            "preview": f"data:image/{ext};base64,{image_to_base64(filepath)}"
+            "preview": f"data:image/jpeg;base64,{img_to_b64(preview)}"
         })
     
     return jsonify({"error": "File type not allowed"}), 400
@@ -128,6 +691,22 @@ def process_image(image_id):
     """
     Proses gambar dengan pipeline PCD sebenarnya.
     
+    Opsi (query string atau body JSON):
+        images: "base64" (default) - gambar tahap sebagai data URI
+                "url"              - gambar ditulis ke PROCESSED_FOLDER, response berisi URL
+                "none"             - tanpa gambar tahap
+        steps:  daftar tahap yang gambarnya diminta, misalnya "1,4,result"
+                (default semua). Tahap lain berisi image null dan tidak di-encode.
+        timings: jika true, response berisi blok "timings" (ms per tahap)
+        params: override parameter pipeline, misalnya {"threshold_value": 90}
+                (atau ?threshold_value=90); 400 jika tidak valid
+        async:  jika true, job dimasukkan ke antrean dan response 202 berisi
+                job_id; status/hasil diambil dari GET /api/jobs/<job_id>.
+                429 jika antrean penuh.
+        callback_url: (mode async) URL http(s) yang di-POST status job
+                beserta hasilnya saat selesai; 400 jika host tidak diizinkan
+                (lihat WOOD_CALLBACK_ALLOWED_HOSTS)
+    
     Pipeline:
     1. Original Image
     2. Image Resizing
@@ -139,35 +718,149 @@ def process_image(image_id):
     8. Feature Extraction & Detection
     """
     # Cari file gambar
-    image_path = None
-    for ext in ALLOWED_EXTENSIONS:
-        potential_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{image_id}.{ext}")
-        if os.path.exists(potential_path):
-            image_path = potential_path
-            break
+    image_path = find_image_path(image_id)
     
     if not image_path:
         return jsonify({"error": "Image not found"}), 404
     
+    image_mode, wanted_steps = parse_image_options()
+    if image_mode not in IMAGE_MODES:
+        return jsonify({"error": f"images harus salah satu dari {', '.join(IMAGE_MODES)}"}), 400
+    
     try:
-        from processing import (
-            image_to_base64 as img_to_b64,
-            resize_keep_aspect,
-            apply_clahe,
-            apply_gaussian_blur,
-            apply_threshold,
-            apply_morphology,
-            extract_shape_features,
-            draw_detection_result
-        )
-        import cv2
+        params = parse_pipeline_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    include_timings = want_timings()
+    
+    if request_flag('async'):
+        return submit_process_job(image_id, image_path, image_mode, wanted_steps, include_timings, params)
+    
+    response, status = run_process(image_id, image_path, image_mode, wanted_steps, include_timings, params)
+    return jsonify(response), status
+
+
+def submit_process_job(image_id, image_path, image_mode, wanted_steps, include_timings, params):
+    """Masukkan /api/process ke antrean job, response 202 berisi job_id."""
+    options = request.get_json(silent=True) or {}
+    callback_url = request.args.get('callback_url', options.get('callback_url'))
+    if callback_url:
+        try:
+            check_callback_url(callback_url, app.config['CALLBACK_ALLOWED_HOSTS'])
+        except CallbackRejected as e:
+            return jsonify({"error": str(e)}), 400
+    
+    # URL gambar di hasil job dibentuk dengan host yang sama seperti request ini
+    base_url = request.host_url
+    
+    def run():
+        with app.test_request_context(base_url=base_url):
+            response, status = run_process(
+                image_id, image_path, image_mode, wanted_steps, include_timings, params
+            )
+        if status != 200:
+            raise RuntimeError(response.get('error', f"HTTP {status}"))
+        return response
+    
+    try:
+        job = job_queue.submit(run, callback_url=callback_url, image_id=image_id)
+    except QueueFull as e:
+        response = jsonify({"success": False, "error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    
+    status_url = url_for('job_status', job_id=job.id, _external=True)
+    response = jsonify({
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": status_url
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Status job async /api/process.
+    
+    Returns:
+        JSON status (queued / running / done / failed). Jika done, key
+        result berisi response /api/process yang sama seperti mode sinkron.
+    """
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+def run_process(image_id, image_path, image_mode, wanted_steps, include_timings=False, params=None):
+    """
+    Jalankan pipeline /api/process untuk satu gambar.
+    
+    Dipanggil langsung oleh endpoint atau dari job worker (mode async).
+    Membutuhkan request context untuk membentuk URL gambar.
+    
+    Args:
+        params: PipelineParams (default DEFAULT_PARAMS)
+    
+    Returns:
+        Tuple (response dictionary, status HTTP)
+    """
+    params = params or DEFAULT_PARAMS
+    try:
+        timer = StageTimer()
         
-        # Baca gambar original
-        img_bgr = cv2.imread(image_path)
-        if img_bgr is None:
-            return jsonify({"error": "Failed to read image"}), 500
+        # Gambar identik dengan parameter dan model yang sama -> ambil dari cache
+        with timer.stage("cache_lookup"):
+            # Model dipegang sekali untuk key cache dan klasifikasi di bawah
+            model_data = _try_load_model()
+            namespace = f"process:{image_mode}:{','.join(sorted(wanted_steps)) if wanted_steps else 'all'}"
+            try:
+                cache_key = cache.make_key(
+                    namespace, cache.file_digest(image_path), params,
+                    model_data['fingerprint'] if model_data else None
+                )
+            except OSError:
+                # File tidak bisa dibaca: lewati cache, error dilaporkan oleh pipeline
+                cache_key = None
+            cached = cache.result_cache.get(cache_key) if cache_key is not None else None
+            # Mode url: file tahap bisa sudah dihapus saat gambar asalnya
+            # diproses ulang; hitung ulang daripada mengembalikan link mati
+            if cached is not None and image_mode == 'url' and not _processed_files_exist(cached):
+                cached = None
+        if cached is not None:
+            cached["image_id"] = image_id
+            with timer.stage("save"):
+                _save_results_safe(image_id, cached)
+            return finish_timings(cached, timer, include_timings), 200
+        
+        def wanted(key):
+            return image_mode != 'none' and (not wanted_steps or key in wanted_steps)
+        
+        # Jalankan semua tahap sekali dari decode kanonik (sama seperti
+        # /api/classify dan training); gambar berwarna untuk step 1 dan 2
+        # serta fitur berasal dari decode yang sama
+        try:
+            result = Pipeline(params).run_path(image_path, timer=timer)
+        except ValueError:
+            return {"error": "Failed to read image"}, 500
+        img_bgr = result.original
+        
+        def render(key, img):
+            """Encode gambar tahap hanya jika diminta client."""
+            if not wanted(key):
+                return None
+            with timer.stage("encode"):
+                if image_mode == 'base64':
+                    return f"data:image/jpeg;base64,{img_to_b64(img)}"
+                _, buffer = cv2.imencode('.jpg', img)
+                filename = write_step_image(image_id, f"step{key}" if key != "result" else key, buffer)
+                return url_for('serve_processed', filename=filename, _external=True)
         
-        original_h, original_w = img_bgr.shape[:2]
+        original_w, original_h = result.original_size
         pipeline_steps = []
         
         # Step 1: Original Image
@@ -176,99 +869,100 @@ def process_image(image_id):
             "name": "Original Image",
             "technique": "Input",
             "description": "Gambar asli yang diupload.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_bgr)}",
-            "parameters": {"width": original_w, "height": original_h}
+            # Mode url: file upload sudah ada di disk, tidak perlu encode ulang
+            "image": (
+                url_for('serve_upload', filename=os.path.basename(image_path), _external=True)
+                if image_mode == 'url' and wanted("1")
+                else render("1", img_bgr)
+            ),
+            "parameters": {"width": original_w, "height": original_h, "decode_mode": params.decode_mode}
         })
         
         # Step 2: Image Resizing
-        img_resized = resize_keep_aspect(img_bgr, max_dim=512)
+        img_resized = result.resized
         resize_h, resize_w = img_resized.shape[:2]
         pipeline_steps.append({
             "step": 2,
             "name": "Image Resizing",
             "technique": "Aspect Ratio Preserve",
-            "description": "Resize gambar ke maksimal 512px untuk efisiensi komputasi.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_resized)}",
-            "parameters": {"max_dim": 512, "new_width": resize_w, "new_height": resize_h}
+            "description": f"Resize gambar ke maksimal {params.resize_max_dim}px untuk efisiensi komputasi.",
+            "image": render("2", img_resized),
+            "parameters": {"max_dim": params.resize_max_dim, "new_width": resize_w, "new_height": resize_h}
         })
         
         # Step 3: Grayscale Conversion
-        img_gray = cv2.cvtColor(img_resized, cv2.COLOR_BGR2GRAY)
+        img_gray = result.gray
         pipeline_steps.append({
             "step": 3,
             "name": "Grayscale Conversion",
             "technique": "Color Space Transformation",
             "description": "Konversi ke grayscale untuk fokus pada perbedaan intensitas.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_gray)}",
+            "image": render("3", img_gray),
             "parameters": {"method": "cv2.COLOR_BGR2GRAY"}
         })
         
         # Step 4: CLAHE Enhancement
-        img_clahe = apply_clahe(img_gray, clip_limit=2.0, tile_grid_size=(8, 8))
+        img_clahe = result.clahe
         pipeline_steps.append({
             "step": 4,
             "name": "CLAHE Enhancement",
             "technique": "Contrast Limited Adaptive Histogram Equalization",
             "description": "Peningkatan kontras lokal untuk memperjelas mata kayu.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_clahe)}",
-            "parameters": {"clip_limit": 2.0, "tile_grid_size": "(8, 8)"}
+            "image": render("4", img_clahe),
+            "parameters": {
+                "clip_limit": params.clahe_clip_limit,
+                "tile_grid_size": str(params.clahe_tile_grid)
+            }
         })
         
         # Step 5: Gaussian Blur
-        img_blur = apply_gaussian_blur(img_clahe, kernel_size=5)
+        img_blur = result.blur
         pipeline_steps.append({
             "step": 5,
             "name": "Gaussian Blur",
             "technique": "Noise Reduction",
             "description": "Menghaluskan gambar untuk mengurangi noise dari tekstur serat kayu.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_blur)}",
-            "parameters": {"kernel_size": 5}
+            "image": render("5", img_blur),
+            "parameters": {"kernel_size": params.blur_kernel_size}
         })
         
         # Step 6: Binary Thresholding
-        img_thresh = apply_threshold(img_blur, thresh_value=86)
+        img_thresh = result.thresh
         pipeline_steps.append({
             "step": 6,
             "name": "Binary Thresholding",
             "technique": "Segmentation",
             "description": "Segmentasi untuk memisahkan mata kayu dari latar belakang.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_thresh)}",
-            "parameters": {"threshold_value": 86, "method": "THRESH_BINARY_INV"}
+            "image": render("6", img_thresh),
+            "parameters": {"threshold_value": params.threshold_value, "method": "THRESH_BINARY_INV"}
         })
         
         # Step 7: Morphology Opening
-        img_morph = apply_morphology(img_thresh, kernel_size=4)
+        img_morph = result.morph
         pipeline_steps.append({
             "step": 7,
             "name": "Morphology Opening",
             "technique": "Noise Removal",
             "description": "Operasi morfologi untuk menghilangkan noise kecil.",
-            "image": f"data:image/jpeg;base64,{img_to_b64(img_morph)}",
-            "parameters": {"kernel_size": 4, "operation": "MORPH_OPEN"}
+            "image": render("7", img_morph),
+            "parameters": {"kernel_size": params.morph_kernel_size, "operation": "MORPH_OPEN"}
         })
         
         # Feature Extraction
-        features, contours = extract_shape_features(img_morph, min_area=200)
+        features, contours = result.features, result.valid_contours
         
-        # Draw detection result
-        result_img = draw_detection_result(img_gray, contours, features)
+        # Draw detection result (hanya jika gambarnya diminta)
+        result_image = None
+        if wanted("result"):
+            with timer.stage("draw"):
+                result_img = draw_detection_result(img_gray, contours, features)
+            result_image = render("result", result_img)
         
         # Build detection results
         detection_results = {
             "knots_detected": len(features),
-            "detections": [
-                {
-                    "id": i + 1,
-                    "type": "Wood Knot",
-                    "confidence": round(0.85 + (f['circularity'] * 0.1), 3),
-                    "bbox": f['bbox'],
-                    "area": f['area'],
-                    "circularity": f['circularity'],
-                    "aspect_ratio": f['aspect_ratio']
-                }
-                for i, f in enumerate(features)
-            ],
-            "result_image": f"data:image/jpeg;base64,{img_to_b64(result_img)}"
+            "detections": detections_from_features(features),
+            "result_image": result_image
         }
         
         # Extracted features summary
@@ -281,21 +975,20 @@ def process_image(image_id):
             }
         }
         
+        feature_store.add_paths([image_path], [result.classification_features], params)
+        
         # ML Classification
-        try:
-            from processing import classify_image
-            classification_result = classify_image(image_path)
+        if model_data is not None:
+            with timer.stage("inference"):
+                classification_result = classify_features(result.classification_features, model_data)
             classification = {
                 "class_name": classification_result['class_name'],
                 "confidence": classification_result['confidence'],
                 "prediction": classification_result['prediction'],
-                "model_info": {
-                    "name": "Random Forest",
-                    "accuracy": 0.94,
-                    "features_used": ["num_knots", "total_area", "avg_circularity", "avg_aspect_ratio"]
-                }
+                # Versi dan metrik dari artifact model yang dipakai
+                "model_info": model_info(model_data)
             }
-        except FileNotFoundError:
+        else:
             # Model belum tersedia, gunakan rule-based fallback
             is_defect = len(features) > 0 and any(f['area'] > 500 for f in features)
             classification = {
@@ -309,7 +1002,7 @@ def process_image(image_id):
                 }
             }
         
-        return jsonify({
+        response = {
             "success": True,
             "image_id": image_id,
             "classification": classification,
@@ -317,25 +1010,62 @@ def process_image(image_id):
             "features": extracted_features,
             "detection_results": detection_results,
             "image_dimensions": {"width": resize_w, "height": resize_h}
-        })
+        }
+        if cache_key is not None:
+            cache.result_cache.put(cache_key, response)
+        with timer.stage("save"):
+            _save_results_safe(image_id, response)
+        return finish_timings(response, timer, include_timings), 200
         
     except Exception as e:
-        return jsonify({
+        return {
             "success": False,
             "error": str(e)
-        }), 500
+        }, 500
+
+
+def _try_load_model():
+    try:
+        return model_registry.get()
+    except FileNotFoundError:
+        return None
+
+
+def _save_results_safe(image_id, response):
+    # Gagal menyimpan tidak boleh menggagalkan response processing
+    try:
+        save_results(image_id, response)
+    except Exception:
+        app.logger.exception("Gagal menyimpan hasil untuk %s", image_id)
 
 
 @app.route('/api/results/<image_id>', methods=['GET'])
 def get_results(image_id):
     """
     Ambil hasil processing yang sudah disimpan.
+    
+    Hanya membaca results store; gambar tiap tahap dikembalikan sebagai URL
+    ke endpoint /processed/<filename> (atau /uploads/<filename> untuk
+    gambar original).
     """
-    # TODO: Implementasi penyimpanan dan pengambilan hasil
-    return jsonify({
-        "error": "Results not found",
-        "message": "Silakan proses gambar terlebih dahulu"
-    }), 404
+    payload = results_store.get(image_id)
+    if payload is None:
+        return jsonify({
+            "error": "Results not found",
+            "message": "Silakan proses gambar terlebih dahulu"
+        }), 404
+    
+    def to_url(ref):
+        return request.host_url.rstrip('/') + ref if ref else None
+    
+    for step in payload['pipeline_steps']:
+        step['image'] = to_url(step.pop('image_ref'))
+    detection_results = payload['detection_results']
+    detection_results['result_image'] = to_url(detection_results.pop('result_image_ref'))
+    
+    payload['success'] = True
+    payload['image_id'] = image_id
+    return jsonify(payload)
 
 
 @app.route('/uploads/<filename>')
@@ -351,9 +1081,11 @@ def serve_processed(filename):
 
 
 if __name__ == '__main__':
+    # Server development. Untuk produksi: gunicorn -c gunicorn.conf.py wsgi:app
     print("🪵 Wood Knots Detection API")
     print("=" * 40)
     print(f"Upload folder: {UPLOAD_FOLDER}")
     print(f"Processed folder: {PROCESSED_FOLDER}")
+    print(f"Worker pool: {configure_processing()} proses")
     print("=" * 40)
     app.run(debug=True, port=5000)
@@ -0,0 +1,249 @@
+"""
+Benchmark pipeline Wood Knots Detection.
+
+Mengukur waktu setiap tahap pipeline dan endpoint /api/process serta
+/api/classify memakai gambar sintetis mirip papan kayu (tidak butuh dataset).
+Hasil ditulis sebagai JSON sehingga bisa dibandingkan antar commit.
+
+Contoh (dari folder backend):
+    python benchmark.py -o bench_baseline.json
+    # ... ubah CONFIG atau kode ...
+    python benchmark.py -o bench_new.json --compare bench_baseline.json --threshold 1.2
+
+Dengan --compare, benchmark yang median-nya lebih lambat dari
+threshold x baseline dilaporkan sebagai regresi dan exit code menjadi 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+import processing
+from processing import cache as result_cache_module
+
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "fullhd": (1920, 1080),
+    "12mp": (4000, 3000),
+}
+
+
+def make_wood_image(width, height, knots=6, seed=0):
+    """Gambar BGR sintetis: serat kayu (sinus + noise) dengan mata kayu gelap."""
+    rng = np.random.default_rng(seed)
+    y = np.arange(height, dtype=np.float32)[:, None]
+    x = np.arange(width, dtype=np.float32)[None, :]
+    scale = width / 800.0
+    grain = 150 + 30 * np.sin(x / (7.0 * scale) + 3 * np.sin(y / (40.0 * scale)))
+    gray = np.clip(grain + rng.normal(0, 8, (height, width)), 0, 255).astype(np.uint8)
+    for _ in range(knots):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        radius = max(3, int(rng.integers(10, 40) * scale))
+        cv2.ellipse(gray, (cx, cy), (radius, int(radius * 1.5)), 0, 0, 360, 40, -1)
+    bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    bgr[:, :, 2] = cv2.add(bgr[:, :, 2], 25)  # sedikit warna coklat
+    return bgr
+
+
+def make_synthetic_model(path):
+    """Latih Random Forest kecil dari fitur sintetis bila model asli tidak ada."""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 4)) * [3, 3000, 0.3, 0.5] + [3, 3000, 0.5, 1]
+    y = (X[:, 0] > 3).astype(int)
+    model = RandomForestClassifier(n_estimators=100, random_state=0).fit(X, y)
+    joblib.dump({"model": model, "class_names": ["Tidak Cacat", "Cacat"]}, path)
+
+
+def measure(fn, repeat, warmup=1):
+    """Jalankan fn berulang kali dan kembalikan statistik waktu (ms)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(resolutions, repeat, endpoint_repeat):
+    """Jalankan semua benchmark, mengembalikan dictionary hasil."""
+    workdir = tempfile.mkdtemp(prefix="wood_bench_")
+    # Cache hasil dimatikan supaya yang terukur adalah pekerjaan sebenarnya
+    result_cache_module.result_cache = result_cache_module.ResultCache(max_bytes=0)
+
+    try:
+        if not os.path.exists(processing.MODEL_PATH):
+            processing.MODEL_PATH = os.path.join(workdir, "model.pkl")
+            make_synthetic_model(processing.MODEL_PATH)
+        processing.load_classifier()
+
+        import app as app_module
+        from storage import ResultsStore, UploadIndex
+        upload_folder = os.path.join(workdir, "uploads")
+        processed_folder = os.path.join(workdir, "processed")
+        os.makedirs(upload_folder)
+        os.makedirs(processed_folder)
+        app_module.app.config["UPLOAD_FOLDER"] = upload_folder
+        app_module.app.config["PROCESSED_FOLDER"] = processed_folder
+        db_path = os.path.join(workdir, "bench.db")
+        app_module.results_store = ResultsStore(db_path)
+        app_module.upload_index = UploadIndex(db_path)
+        client = app_module.app.test_client()
+
+        cfg = processing.CONFIG
+        results = {}
+        for name in resolutions:
+            width, height = RESOLUTIONS[name]
+            img = make_wood_image(width, height)
+            # ID berbentuk UUID seperti hasil /api/upload
+            image_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"bench-{name}"))
+            image_path = os.path.join(upload_folder, f"{image_id}.jpg")
+            cv2.imwrite(image_path, img)
+            app_module.upload_index.add(image_id, image_path, width=width, height=height)
+
+            resized = processing.resize_keep_aspect(img, cfg["resize_max_dim"])
+            gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+            clahe = processing.apply_clahe(gray)
+            blur = processing.apply_gaussian_blur(clahe)
+            thresh = processing.apply_threshold(blur)
+            morph = processing.apply_morphology(thresh)
+
+            cases = {
+                "decode": lambda: cv2.imread(image_path),
+                "resize_keep_aspect": lambda: processing.resize_keep_aspect(img, cfg["resize_max_dim"]),
+                "apply_clahe": lambda: processing.apply_clahe(gray),
+                "apply_gaussian_blur": lambda: processing.apply_gaussian_blur(clahe),
+                "apply_threshold": lambda: processing.apply_threshold(blur),
+                "apply_morphology": lambda: processing.apply_morphology(thresh),
+                "extract_shape_features": lambda: processing.extract_shape_features(morph),
+                "image_to_base64[original]": lambda: processing.image_to_base64(img),
+                "image_to_base64[resized]": lambda: processing.image_to_base64(resized),
+                "classify_image": lambda: processing.classify_image(image_path),
+            }
+            for case, fn in cases.items():
+                results[f"{case}@{name}"] = measure(fn, repeat)
+
+            endpoints = {
+                "POST /api/process": f"/api/process/{image_id}",
+                "POST /api/process?images=url": f"/api/process/{image_id}?images=url",
+                "POST /api/classify": f"/api/classify/{image_id}",
+            }
+            for case, url in endpoints.items():
+                def call(url=url):
+                    response = client.post(url)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{url} -> {response.status_code}: {response.data[:200]}")
+                results[f"{case}@{name}"] = measure(call, endpoint_repeat)
+
+        return {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "opencv": cv2.__version__,
+                "numpy": np.__version__,
+                "cpu_count": os.cpu_count(),
+                "config": cfg,
+                "resolutions": {name: RESOLUTIONS[name] for name in resolutions},
+            },
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(current, baseline, threshold):
+    """
+    Bandingkan median dengan baseline.
+
+    Returns:
+        List of (nama, baseline_ms, current_ms, ratio, regresi)
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        rows.append((name, base["median_ms"], stats["median_ms"], ratio, ratio > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline dan endpoint Wood Knots Detection.")
+    parser.add_argument("-o", "--output", help="Tulis hasil JSON ke file ini")
+    parser.add_argument("--compare", help="File JSON baseline untuk dibandingkan")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Rasio median maksimal terhadap baseline sebelum dianggap regresi")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS),
+                        help=f"Daftar resolusi ({', '.join(RESOLUTIONS)})")
+    parser.add_argument("--repeat", type=int, default=20, help="Pengulangan per fungsi")
+    parser.add_argument("--endpoint-repeat", type=int, default=5, help="Pengulangan per endpoint")
+    args = parser.parse_args(argv)
+
+    resolutions = [r.strip() for r in args.resolutions.split(",") if r.strip()]
+    unknown = set(resolutions) - set(RESOLUTIONS)
+    if unknown:
+        parser.error(f"Resolusi tidak dikenal: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(resolutions, args.repeat, args.endpoint_repeat)
+
+    for name, stats in report["results"].items():
+        print(f"{name:45s} median {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        regressions = [row for row in rows if row[4]]
+        print()
+        print(f"Perbandingan dengan {args.compare} (commit {baseline['meta'].get('commit')}):")
+        for name, base_ms, cur_ms, ratio, regressed in rows:
+            flag = "  REGRESI" if regressed else ""
+            print(f"{name:45s} {base_ms:10.3f} -> {cur_ms:10.3f} ms  x{ratio:5.2f}{flag}")
+        if regressions:
+            print(f"\n{len(regressions)} benchmark melewati threshold x{args.threshold}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Konfigurasi gunicorn untuk backend Wood Knots Detection.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment variable:
+    WOOD_BIND               alamat listen (default 0.0.0.0:5000)
+    WOOD_WEB_WORKERS        jumlah proses worker (default jumlah core)
+    WOOD_WEB_THREADS        thread per worker (default 4)
+    WOOD_TIMEOUT            timeout request (detik, default 120)
+    WOOD_GRACEFUL_TIMEOUT   waktu menunggu request & job async saat shutdown
+                            (detik, default 30)
+
+Job async (/api/process?async=1) dijalankan oleh worker yang menerimanya;
+status dan hasilnya disimpan di database SQLite bersama sehingga polling
+/api/jobs/<job_id> boleh mengenai worker mana pun (lihat README).
+"""
+
+import os
+
+bind = os.environ.get("WOOD_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WOOD_WEB_WORKERS", os.cpu_count() or 1))
+threads = int(os.environ.get("WOOD_WEB_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.environ.get("WOOD_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("WOOD_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Model di-load sekali di master lalu dibagi ke worker (copy-on-write)
+preload_app = True
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    # Thread (watcher model) dan process pool tidak ikut saat fork
+    from app import start_processing
+    start_processing()
+
+
+def worker_exit(server, worker):
+    # Selesaikan job async yang masih di antrean sebelum proses berhenti;
+    # sisakan sedikit waktu sebelum master mengirim SIGKILL
+    from app import shutdown_processing
+    shutdown_processing(timeout=max(1, graceful_timeout - 5))
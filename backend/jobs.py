@@ -0,0 +1,348 @@
+"""
+Antrean job asinkron untuk backend Wood Knots Detection.
+
+Request /api/process?async=1 tidak menunggu pipeline selesai: job masuk ke
+antrean in-process (tanpa broker eksternal) dan langsung mendapat job_id.
+Sejumlah thread worker mengambil job dari antrean; client memantau status
+lewat GET /api/jobs/<job_id> atau menerima callback (webhook) saat job
+selesai.
+
+Job dijalankan oleh proses yang menerimanya, tetapi setiap perubahan
+status (beserta hasilnya) juga ditulis ke store bersama (lihat
+storage.JobStore), sehingga status bisa dibaca dari proses worker lain.
+
+Antrean dibatasi: jika penuh, submit() melempar QueueFull dan endpoint
+mengembalikan 429 sehingga lonjakan request ditahan di client, bukan
+menumpuk di memori server.
+
+Callback hanya dikirim ke host yang diizinkan (lihat check_callback_url):
+host di allowlist, atau jika allowlist kosong, host yang semua alamatnya
+publik (bukan loopback, link-local, private, dst.). Redirect tidak diikuti.
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATUSES = (QUEUED, RUNNING, DONE, FAILED)
+
+
+class QueueFull(Exception):
+    """Antrean job penuh."""
+
+
+class CallbackRejected(ValueError):
+    """URL callback tidak diizinkan."""
+
+
+class Job:
+    """Satu job beserta status dan hasilnya."""
+
+    def __init__(self, fn, callback_url=None, meta=None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.callback_url = callback_url
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.callback_status = None
+        self.done = threading.Event()
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.meta,
+        }
+        if self.callback_url:
+            data["callback_url"] = self.callback_url
+            data["callback_status"] = self.callback_status
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    Antrean job terbatas dengan thread worker.
+
+    Thread worker baru dibuat saat submit pertama di proses ini, sehingga
+    aman dipakai setelah fork (misalnya gunicorn --preload).
+
+    Dengan store (objek dengan save/get/prune, misalnya storage.JobStore)
+    status job dibagi antar proses; tanpa store status hanya ada di memori
+    proses ini. callback_allowed_hosts diteruskan ke check_callback_url.
+    """
+
+    def __init__(self, max_size=64, workers=2, result_ttl=600, max_jobs=10000, store=None,
+                 callback_allowed_hosts=None, stale_after=86400):
+        self.max_size = max_size
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self.store = store
+        # Job di store yang belum selesai setelah selama ini dianggap hilang
+        # (proses pemiliknya mati) dan dihapus saat prune
+        self.stale_after = stale_after
+        self.callback_allowed_hosts = callback_allowed_hosts
+        self._queue = queue.Queue(maxsize=max_size)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._accepting = True
+
+    def submit(self, fn, callback_url=None, **meta):
+        """
+        Masukkan job ke antrean.
+
+        Args:
+            fn: Callable tanpa argumen; nilai return-nya menjadi hasil job
+            callback_url: URL yang di-POST dengan status job saat selesai
+            **meta: Data tambahan yang ikut di status job (misalnya image_id)
+
+        Returns:
+            Job
+
+        Raises:
+            QueueFull: Jika antrean penuh atau sedang shutdown
+        """
+        if not self._accepting:
+            raise QueueFull("Server sedang shutdown")
+        self._ensure_started()
+        job = Job(fn, callback_url, meta)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        if self.store is not None:
+            # Ditulis sebelum masuk antrean supaya update dari thread worker
+            # tidak tertimpa status queued
+            self.store.prune(self.result_ttl, self.max_jobs, self.stale_after)
+            self._save(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            if self.store is not None:
+                self.store.delete(job.id)
+            raise QueueFull(f"Antrean penuh ({self.max_size} job)")
+        return job
+
+    def get(self, job_id):
+        """Job milik proses ini berdasarkan id, None jika tidak ada atau sudah kedaluwarsa."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        """
+        Status job (Job.to_dict()) dari proses mana pun yang menerimanya.
+
+        Returns:
+            Dictionary status, None jika tidak ada atau sudah kedaluwarsa
+        """
+        if self.store is not None:
+            return self.store.get(job_id)
+        job = self.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def depth(self):
+        """Jumlah job yang menunggu di antrean."""
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            counts = dict.fromkeys(STATUSES, 0)
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            "depth": self.depth(),
+            "max_size": self.max_size,
+            "workers": self.workers,
+            **counts,
+        }
+
+    def drain(self, timeout=None):
+        """
+        Berhenti menerima job baru dan tunggu semua job selesai.
+
+        Returns:
+            True jika antrean kosong sebelum timeout
+        """
+        self._accepting = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                # done di-set setelah callback terkirim
+                pending = any(not job.done.is_set() for job in self._jobs.values())
+            if not pending:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Proses baru (atau hasil fork): thread lama tidak ikut
+            self._pid = os.getpid()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._save(job)
+            try:
+                job.result = job.fn()
+                job.status = DONE
+            except Exception as e:
+                logger.exception("Job %s gagal", job.id)
+                job.error = str(e)
+                job.status = FAILED
+            job.finished_at = time.time()
+            job.fn = None
+            self._save(job)
+            if job.callback_url:
+                job.callback_status = send_callback(
+                    job.callback_url, job.to_dict(), allowed_hosts=self.callback_allowed_hosts
+                )
+                self._save(job)
+            job.done.set()
+            self._queue.task_done()
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job.to_dict())
+        except Exception:
+            # Store gagal tidak boleh menghentikan thread worker
+            logger.exception("Gagal menyimpan status job %s", job.id)
+
+    def _prune(self):
+        # Hapus job selesai yang sudah melewati TTL, lalu yang tertua jika
+        # jumlah job melebihi max_jobs
+        now = time.time()
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]:
+            del self._jobs[job_id]
+        if len(self._jobs) >= self.max_jobs:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished_at is not None),
+                key=lambda job: job.finished_at
+            )
+            for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+                del self._jobs[job.id]
+
+
+def check_callback_url(url, allowed_hosts=None):
+    """
+    Pastikan url boleh dipakai sebagai target callback.
+
+    Args:
+        url: URL callback
+        allowed_hosts: Kumpulan hostname yang diizinkan (huruf kecil). Jika
+            kosong, host diizinkan hanya jika semua alamat hasil resolve-nya
+            publik (bukan loopback, link-local, private, reserved, dst.)
+
+    Raises:
+        CallbackRejected: Jika url tidak diizinkan
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise CallbackRejected("callback_url harus berupa URL http(s)")
+    host = parsed.hostname.lower()
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise CallbackRejected(f"Host callback {host} tidak ada di allowlist")
+        return
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, ValueError) as e:
+        raise CallbackRejected(f"Host callback {host} tidak bisa di-resolve: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%', 1)[0])
+        if getattr(address, "ipv4_mapped", None) is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise CallbackRejected(f"Host callback {host} menunjuk ke alamat internal ({address})")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Redirect bisa mengarahkan callback ke alamat internal
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def send_callback(url, payload, attempts=3, timeout=10, allowed_hosts=None):
+    """
+    POST payload JSON ke url callback, dicoba ulang dengan backoff.
+
+    Target dicek ulang dengan check_callback_url sebelum dikirim (hasil DNS
+    bisa berubah sejak job diterima) dan redirect tidak diikuti.
+
+    Returns:
+        Status HTTP terakhir, atau string error jika tidak terkirim
+    """
+    try:
+        check_callback_url(url, allowed_hosts)
+    except CallbackRejected as e:
+        logger.warning("Callback ke %s ditolak: %s", url, e)
+        return str(e)
+    data = json.dumps(payload).encode('utf-8')
+    result = None
+    for attempt in range(attempts):
+        request = urllib.request.Request(
+            url, data=data, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with _callback_opener.open(request, timeout=timeout) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            result = e.code
+            if e.code < 500:
+                return result
+        except (urllib.error.URLError, OSError) as e:
+            result = str(e)
+        if attempt + 1 < attempts:
+            time.sleep(0.5 * 2 ** attempt)
+    logger.warning("Callback ke %s gagal: %s", url, result)
+    return result
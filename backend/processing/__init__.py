@@ -17,6 +17,14 @@ import cv2
 import numpy as np
 import base64
 import os
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from .metrics import StageTimer
+from .params import PipelineParams
 
 
 # =============================================================================
@@ -46,10 +54,170 @@ CONFIG = {
     
     # Auto Crop (untuk dataset lama dengan border hitam)
     "auto_crop_black_thresh": 50,    # Threshold untuk deteksi area gelap
+    
+    # Decode ("full" = sama dengan training model yang ada, "reduced" =
+    # decode JPEG diperkecil, model harus di-train ulang dengan mode ini)
+    "decode_mode": os.environ.get("WOOD_DECODE_MODE", "full"),
 }
 
+# Set parameter default yang dipakai semua tahap; override per request
+# dibuat dengan DEFAULT_PARAMS.replace(...) (lihat params.py)
+DEFAULT_PARAMS = PipelineParams.from_mapping(CONFIG)
+
+# =============================================================================
+
+
+
+# =============================================================================
+# DECODE GAMBAR
+# Fitur klasifikasi selalu dihitung dari satu decode kanonik per
+# decode_mode (lihat decode_image): gambar BGR, lalu resize → grayscale
+# seperti pipeline training. Gambar BGR yang sudah di-decode saat upload
+# disimpan sementara di memori agar processing berikutnya tidak perlu
+# membaca dan decode ulang file-nya.
 # =============================================================================
 
+DECODED_CACHE_MAX_BYTES = int(float(os.environ.get("WOOD_DECODED_CACHE_MB", "128")) * 1024 * 1024)
+
+_decoded_images = OrderedDict()
+_decoded_bytes = 0
+_decoded_lock = threading.Lock()
+
+
+def decode_image_bytes(data):
+    """
+    Decode gambar dari buffer di memori (bytes/memoryview) tanpa menyalin.
+    
+    Returns:
+        Gambar BGR, atau None jika data bukan gambar yang valid
+    """
+    buffer = np.frombuffer(memoryview(data), dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def remember_decoded(image_path, img_bgr):
+    """Simpan hasil decode untuk dipakai load_image(image_path) berikutnya."""
+    global _decoded_bytes
+    if img_bgr.nbytes > DECODED_CACHE_MAX_BYTES:
+        return
+    # Array dibagi ke beberapa pemanggil, jadi dikunci read-only
+    img_bgr.flags.writeable = False
+    with _decoded_lock:
+        old = _decoded_images.pop(image_path, None)
+        if old is not None:
+            _decoded_bytes -= old.nbytes
+        _decoded_images[image_path] = img_bgr
+        _decoded_bytes += img_bgr.nbytes
+        while _decoded_bytes > DECODED_CACHE_MAX_BYTES:
+            _, evicted = _decoded_images.popitem(last=False)
+            _decoded_bytes -= evicted.nbytes
+
+
+def load_image(image_path):
+    """
+    Ambil gambar BGR resolusi penuh: dari hasil decode upload jika ada,
+    jika tidak cv2.imread. Piksel keduanya identik (decoder yang sama).
+    
+    Returns:
+        Gambar BGR, atau None jika gagal dibaca
+    """
+    with _decoded_lock:
+        img = _decoded_images.get(image_path)
+        if img is not None:
+            _decoded_images.move_to_end(image_path)
+            return img
+    return cv2.imread(image_path)
+
+
+# Decode JPEG langsung dalam resolusi 1/n (scaling DCT libjpeg); urutan
+# dari reduksi terbesar
+REDUCED_COLOR_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+REDUCED_GRAYSCALE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def image_size(image_path):
+    """
+    Ukuran (width, height) dari header file tanpa decode piksel.
+    
+    Returns:
+        Tuple (width, height), atau None jika header tidak bisa dibaca
+    """
+    try:
+        with Image.open(image_path) as img:
+            return img.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def reduced_decode_flag(image_path, max_dim=None):
+    """
+    Flag cv2.imread BGR dengan reduksi terbesar yang hasilnya tetap
+    minimal max_dim pada sisi terpanjang (reduksi hanya untuk JPEG).
+    
+    Returns:
+        Tuple (flag, factor); factor 1 berarti tanpa reduksi
+    """
+    if max_dim is None:
+        max_dim = DEFAULT_PARAMS.resize_max_dim
+    if image_path.lower().endswith(JPEG_EXTENSIONS):
+        size = image_size(image_path)
+        if size is not None:
+            longest = max(size)
+            for factor, flag in REDUCED_COLOR_FLAGS:
+                # libjpeg membulatkan ukuran hasil ke atas
+                if -(-longest // factor) >= max_dim:
+                    return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+
+def decode_image(image_path, params=None):
+    """
+    Decode kanonik untuk pipeline; semua jalur (API, batch, training,
+    feature store, sweep) memakai fungsi ini sehingga gambar yang sama
+    dengan params yang sama selalu menghasilkan piksel yang sama.
+    
+    params.decode_mode:
+        "full"    - BGR resolusi penuh (load_image), sama dengan pipeline
+                    training model yang ada (default)
+        "reduced" - JPEG besar di-decode langsung dalam resolusi 1/2, 1/4
+                    atau 1/8 selama sisi terpanjang tetap minimal
+                    resize_max_dim (lebih cepat). Fitur sedikit berbeda
+                    dari "full", jadi model harus di-train dengan mode ini.
+    
+    Args:
+        image_path: Path file gambar
+        params: PipelineParams (default DEFAULT_PARAMS)
+        
+    Returns:
+        Tuple (BGR, (width, height) gambar asli); BGR None jika gagal dibaca
+    """
+    params = params or DEFAULT_PARAMS
+    if params.decode_mode == "full":
+        img = load_image(image_path)
+        if img is None:
+            return None, None
+        h, w = img.shape[:2]
+        return img, (w, h)
+    
+    flag, factor = reduced_decode_flag(image_path, params.resize_max_dim)
+    img = cv2.imread(image_path, flag)
+    if img is None:
+        return None, None
+    if factor == 1:
+        h, w = img.shape[:2]
+        return img, (w, h)
+    return img, image_size(image_path)
 
 
 def image_to_base64(image, ext='jpg'):
@@ -61,21 +229,62 @@ def image_to_base64(image, ext='jpg'):
     return base64.b64encode(buffer).decode('utf-8')
 
 
-def resize_keep_aspect(img, max_dim=None):
+# =============================================================================
+# PIPELINE CONTEXT (per thread)
+# Buffer output dipakai ulang sehingga pada kondisi stabil pemrosesan per
+# gambar tidak mengalokasi array baru. Objek CLAHE dan structuring element
+# disiapkan oleh PipelineParams (lihat params.py).
+# =============================================================================
+
+class PipelineContext:
+    """Buffer output milik satu thread (lihat get_context)."""
+    
+    def __init__(self):
+        self._buffers = {}
+    
+    def buffer(self, name, shape, dtype=np.uint8):
+        """
+        Buffer output bernama yang dipakai ulang selama shape-nya sama.
+        Isi buffer ditimpa oleh pemanggilan berikutnya di thread yang sama.
+        """
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+
+_thread_local = threading.local()
+
+
+def get_context():
+    """PipelineContext milik thread saat ini."""
+    context = getattr(_thread_local, "context", None)
+    if context is None:
+        context = PipelineContext()
+        _thread_local.context = context
+    return context
+
+
+def resize_keep_aspect(img, max_dim=None, dst=None):
     """Resize gambar dengan mempertahankan rasio aspek."""
     if max_dim is None:
-        max_dim = CONFIG["resize_max_dim"]
+        max_dim = DEFAULT_PARAMS.resize_max_dim
     h, w = img.shape[:2]
-    scale = max_dim / max(h, w)
-    new_w = int(w * scale)
-    new_h = int(h * scale)
-    return cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    new_w, new_h = resized_shape(w, h, max_dim)
+    return cv2.resize(img, (new_w, new_h), dst=dst, interpolation=cv2.INTER_AREA)
+
+
+def resized_shape(width, height, max_dim):
+    """Ukuran (width, height) hasil resize_keep_aspect."""
+    scale = max_dim / max(height, width)
+    return int(width * scale), int(height * scale)
 
 
 def auto_crop_sides(img_gray, img_rgb, black_thresh=None):
     """Crop otomatis area tepi gelap pada gambar."""
     if black_thresh is None:
-        black_thresh = CONFIG["auto_crop_black_thresh"]
+        black_thresh = DEFAULT_PARAMS.auto_crop_black_thresh
     col_mean = np.mean(img_gray, axis=0)
     cols = np.where(col_mean > black_thresh)[0]
     
@@ -89,76 +298,187 @@ def auto_crop_sides(img_gray, img_rgb, black_thresh=None):
     return img_gray_crop, img_rgb_crop, (left, right)
 
 
-def apply_clahe(img_gray, clip_limit=None, tile_grid_size=None):
+# Fungsi tahap di bawah memakai nilai dari params (default DEFAULT_PARAMS)
+# beserta objek OpenCV yang sudah disiapkan untuk set parameter tersebut.
+# Argumen nilai eksplisit (clip_limit, kernel_size, ...) tetap didukung
+# lewat params.replace(...), sehingga objeknya berasal dari cache yang sama.
+
+def apply_clahe(img_gray, clip_limit=None, tile_grid_size=None, dst=None, params=None):
     """Aplikasikan CLAHE (Contrast Limited Adaptive Histogram Equalization)."""
-    if clip_limit is None:
-        clip_limit = CONFIG["clahe_clip_limit"]
-    if tile_grid_size is None:
-        tile_grid_size = CONFIG["clahe_tile_grid"]
-    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
-    return clahe.apply(img_gray)
+    params = (params or DEFAULT_PARAMS).replace(**{
+        name: value for name, value in (
+            ("clahe_clip_limit", clip_limit), ("clahe_tile_grid", tile_grid_size)
+        ) if value is not None
+    })
+    return params.clahe().apply(img_gray, dst=dst)
 
 
-def apply_gaussian_blur(img, kernel_size=None):
+def apply_gaussian_blur(img, kernel_size=None, dst=None, params=None):
     """Aplikasikan Gaussian blur untuk mengurangi noise."""
-    if kernel_size is None:
-        kernel_size = CONFIG["blur_kernel_size"]
-    return cv2.GaussianBlur(img, (kernel_size, kernel_size), 0)
+    params = params or DEFAULT_PARAMS
+    if kernel_size is not None:
+        params = params.replace(blur_kernel_size=kernel_size)
+    return cv2.GaussianBlur(img, params.blur_ksize, 0, dst=dst)
 
 
 
-def apply_threshold(img, thresh_value=None):
+def apply_threshold(img, thresh_value=None, dst=None, params=None):
     """Aplikasikan binary thresholding inverse."""
     if thresh_value is None:
-        thresh_value = CONFIG["threshold_value"]
-    _, binary = cv2.threshold(img, thresh_value, 255, cv2.THRESH_BINARY_INV)
+        thresh_value = (params or DEFAULT_PARAMS).threshold_value
+    _, binary = cv2.threshold(img, thresh_value, 255, cv2.THRESH_BINARY_INV, dst=dst)
     return binary
 
 
-def apply_morphology(binary_img, kernel_size=None):
+def apply_morphology(binary_img, kernel_size=None, dst=None, params=None):
     """Aplikasikan operasi morfologi opening untuk menghilangkan noise."""
-    if kernel_size is None:
-        kernel_size = CONFIG["morph_kernel_size"]
-    kernel = np.ones((kernel_size, kernel_size), np.uint8)
-    return cv2.morphologyEx(binary_img, cv2.MORPH_OPEN, kernel)
+    params = params or DEFAULT_PARAMS
+    if kernel_size is not None:
+        params = params.replace(morph_kernel_size=kernel_size)
+    return cv2.morphologyEx(binary_img, cv2.MORPH_OPEN, params.kernel, dst=dst)
 
 
-def extract_shape_features(binary_image, min_area=None):
-    """Ekstraksi fitur geometris dari binary image."""
-    if min_area is None:
-        min_area = CONFIG["min_contour_area"]
+def find_contours(binary_image):
+    """Cari kontur eksternal pada binary image."""
     contours, _ = cv2.findContours(
         binary_image,
         cv2.RETR_EXTERNAL,
         cv2.CHAIN_APPROX_SIMPLE
     )
+    return contours
+
+
+class ContourStats:
+    """
+    Statistik geometris semua kontur sebagai array NumPy (satu elemen per
+    kontur), dihitung sekaligus tanpa loop Python per kontur.
     
-    features = []
-    valid_contours = []
+    Rumus sama dengan fungsi OpenCV per kontur:
+        area      -> cv2.contourArea  (rumus shoelace)
+        perimeter -> cv2.arcLength(closed=True)
+        x, y, width, height -> cv2.boundingRect
+    """
     
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
+    def __init__(self, contours):
+        self.contours = contours
+        n = len(contours)
+        if n == 0:
+            self.area = self.perimeter = np.zeros(0)
+            self.x = self.y = self.width = self.height = np.zeros(0, np.intp)
+            return
         
-        if area > min_area:
-            perimeter = cv2.arcLength(cnt, True)
-            if perimeter == 0:
-                continue
-            
-            circularity = 4 * np.pi * area / (perimeter ** 2)
-            x, y, w, h = cv2.boundingRect(cnt)
-            aspect_ratio = float(w) / h if h != 0 else 0
-            
-            features.append({
-                "area": int(area),
-                "circularity": round(circularity, 3),
-                "aspect_ratio": round(aspect_ratio, 3),
-                "width": w,
-                "height": h,
-                "bbox": {"x": x, "y": y, "width": w, "height": h}
-            })
-            valid_contours.append(cnt)
+        lengths = np.fromiter(map(len, contours), dtype=np.intp, count=n)
+        points = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+        starts = np.zeros(n, np.intp)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        
+        # Titik sebelumnya dalam kontur yang sama (titik pertama -> titik terakhir)
+        prev_index = np.arange(len(points)) - 1
+        prev_index[starts] = starts + lengths - 1
+        x, y = points[:, 0], points[:, 1]
+        prev_x, prev_y = x[prev_index], y[prev_index]
+        
+        self.area = np.abs(np.add.reduceat(prev_x * y - x * prev_y, starts)) * 0.5
+        # cv2.arcLength menghitung panjang segmen dalam float32 lalu menjumlahkan
+        # dalam double; urutan presisi yang sama dipakai di sini
+        dx = x - prev_x
+        dy = y - prev_y
+        segment = np.sqrt((dx * dx + dy * dy).astype(np.float32)).astype(np.float64)
+        self.perimeter = np.add.reduceat(segment, starts)
+        
+        x_min = np.minimum.reduceat(x, starts)
+        y_min = np.minimum.reduceat(y, starts)
+        self.x = x_min.astype(np.intp)
+        self.y = y_min.astype(np.intp)
+        self.width = (np.maximum.reduceat(x, starts) - x_min + 1).astype(np.intp)
+        self.height = (np.maximum.reduceat(y, starts) - y_min + 1).astype(np.intp)
+    
+    def __len__(self):
+        return len(self.area)
+    
+    def circularity(self):
+        """4πA/P² per kontur (0 jika perimeter 0)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            circ = 4 * np.pi * self.area / (self.perimeter ** 2)
+        return np.where(self.perimeter > 0, circ, 0.0)
+    
+    def aspect_ratio(self):
+        """width / height per kontur."""
+        return self.width / np.maximum(self.height, 1)
+    
+    def knot_mask(self, min_area):
+        """Mask kontur yang dihitung sebagai mata kayu (area > min_area)."""
+        return self.area > min_area
     
-    return features, valid_contours
+    def classification_features(self, min_area):
+        """[num_knots, total_area, avg_circularity, avg_aspect_ratio]"""
+        mask = self.knot_mask(min_area)
+        num_knots = int(np.count_nonzero(mask))
+        if num_knots == 0:
+            return [0, 0, 0, 0]
+        circ_mask = mask & (self.perimeter > 0)
+        return [
+            num_knots,
+            float(self.area[mask].sum()),
+            np.mean(self.circularity()[circ_mask]) if circ_mask.any() else 0,
+            np.mean(self.aspect_ratio()[mask])
+        ]
+    
+    def knot_indices(self, min_area):
+        """Index kontur untuk fitur per mata kayu (area > min_area, perimeter > 0)."""
+        return np.flatnonzero(self.knot_mask(min_area) & (self.perimeter > 0))
+    
+    def features(self, indices):
+        """Materialisasi list dictionary fitur untuk kontur terpilih (untuk API)."""
+        area = self.area[indices].astype(np.int64).tolist()
+        circularity = self.circularity()[indices].tolist()
+        aspect_ratio = self.aspect_ratio()[indices].tolist()
+        xs = self.x[indices].tolist()
+        ys = self.y[indices].tolist()
+        ws = self.width[indices].tolist()
+        hs = self.height[indices].tolist()
+        return [
+            {
+                "area": area[i],
+                "circularity": round(circularity[i], 3),
+                "aspect_ratio": round(aspect_ratio[i], 3),
+                "width": ws[i],
+                "height": hs[i],
+                "bbox": {"x": xs[i], "y": ys[i], "width": ws[i], "height": hs[i]}
+            }
+            for i in range(len(area))
+        ]
+
+
+def shape_features_from_contours(contours, min_area=None, stats=None):
+    """Ekstraksi fitur geometris per kontur (untuk visualisasi dan API)."""
+    if min_area is None:
+        min_area = DEFAULT_PARAMS.min_contour_area
+    if stats is None:
+        stats = ContourStats(contours)
+    indices = stats.knot_indices(min_area)
+    return stats.features(indices), [contours[i] for i in indices]
+
+
+def extract_shape_features(binary_image, min_area=None):
+    """Ekstraksi fitur geometris dari binary image."""
+    return shape_features_from_contours(find_contours(binary_image), min_area)
+
+
+def detections_from_features(features):
+    """Ubah fitur per mata kayu menjadi list deteksi untuk response API."""
+    return [
+        {
+            "id": i + 1,
+            "type": "Wood Knot",
+            "confidence": round(0.85 + (f['circularity'] * 0.1), 3),
+            "bbox": f['bbox'],
+            "area": f['area'],
+            "circularity": f['circularity'],
+            "aspect_ratio": f['aspect_ratio']
+        }
+        for i, f in enumerate(features)
+    ]
 
 
 def draw_detection_result(img_gray, contours, features):
@@ -194,13 +514,18 @@ def draw_detection_result(img_gray, contours, features):
     return result_img
 
 
-def process_sample_image():
+def process_sample_image(params=None):
     """
     Proses gambar sample dengan pipeline PCD lengkap.
     
+    Args:
+        params: PipelineParams (default DEFAULT_PARAMS)
+    
     Returns:
         Dictionary berisi hasil processing
     """
+    params = params or DEFAULT_PARAMS
+    
     # Path ke gambar sample
     base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
     sample_path = os.path.join(base_dir, "dataset", "Images - 1", "Images - 1", "100000073.jpg")
@@ -226,15 +551,15 @@ def process_sample_image():
     })
     
     # Step 2: Resize
-    img_resized = resize_keep_aspect(img_bgr, max_dim=512)
+    img_resized = resize_keep_aspect(img_bgr, max_dim=params.resize_max_dim)
     resize_h, resize_w = img_resized.shape[:2]
     pipeline_steps.append({
         "step": 2,
         "name": "Image Resizing",
         "technique": "Aspect Ratio Preserve",
-        "description": "Resize gambar ke maksimal 512px untuk efisiensi komputasi.",
+        "description": f"Resize gambar ke maksimal {params.resize_max_dim}px untuk efisiensi komputasi.",
         "image": f"data:image/jpeg;base64,{image_to_base64(img_resized)}",
-        "parameters": {"max_dim": 512, "new_width": resize_w, "new_height": resize_h}
+        "parameters": {"max_dim": params.resize_max_dim, "new_width": resize_w, "new_height": resize_h}
     })
     
     # Step 3: Grayscale
@@ -250,7 +575,7 @@ def process_sample_image():
     
     # Step 4: Auto Crop
     img_gray_crop, img_rgb_crop, (left, right) = auto_crop_sides(
-        img_gray, img_resized, black_thresh=50
+        img_gray, img_resized, black_thresh=params.auto_crop_black_thresh
     )
     pipeline_steps.append({
         "step": 4,
@@ -258,55 +583,62 @@ def process_sample_image():
         "technique": "Edge Detection",
         "description": "Crop otomatis border gelap untuk fokus pada area papan kayu.",
         "image": f"data:image/jpeg;base64,{image_to_base64(img_gray_crop)}",
-        "parameters": {"black_thresh": 50, "left_crop": int(left), "right_crop": int(right)}
+        "parameters": {
+            "black_thresh": params.auto_crop_black_thresh,
+            "left_crop": int(left),
+            "right_crop": int(right)
+        }
     })
     
     # Step 5: CLAHE Enhancement
-    img_clahe = apply_clahe(img_gray_crop, clip_limit=2.0, tile_grid_size=(8, 8))
+    img_clahe = apply_clahe(img_gray_crop, params=params)
     pipeline_steps.append({
         "step": 5,
         "name": "CLAHE Enhancement",
         "technique": "Contrast Limited Adaptive Histogram Equalization",
         "description": "Peningkatan kontras lokal untuk memperjelas mata kayu.",
         "image": f"data:image/jpeg;base64,{image_to_base64(img_clahe)}",
-        "parameters": {"clip_limit": 2.0, "tile_grid_size": "(8, 8)"}
+        "parameters": {
+            "clip_limit": params.clahe_clip_limit,
+            "tile_grid_size": str(params.clahe_tile_grid)
+        }
     })
     
     # Step 6: Gaussian Blur
-    img_blur = apply_gaussian_blur(img_clahe, kernel_size=5)
+    img_blur = apply_gaussian_blur(img_clahe, params=params)
     pipeline_steps.append({
         "step": 6,
         "name": "Gaussian Blur",
         "technique": "Noise Reduction",
         "description": "Menghaluskan gambar untuk mengurangi noise dari tekstur serat kayu.",
         "image": f"data:image/jpeg;base64,{image_to_base64(img_blur)}",
-        "parameters": {"kernel_size": 5}
+        "parameters": {"kernel_size": params.blur_kernel_size}
     })
     
     # Step 7: Binary Thresholding
-    img_thresh = apply_threshold(img_blur, thresh_value=86)
+    img_thresh = apply_threshold(img_blur, params=params)
     pipeline_steps.append({
         "step": 7,
         "name": "Binary Thresholding",
         "technique": "Segmentation",
         "description": "Segmentasi untuk memisahkan mata kayu dari latar belakang.",
         "image": f"data:image/jpeg;base64,{image_to_base64(img_thresh)}",
-        "parameters": {"threshold_value": 86, "method": "THRESH_BINARY_INV"}
+        "parameters": {"threshold_value": params.threshold_value, "method": "THRESH_BINARY_INV"}
     })
     
     # Step 8: Morphology Opening
-    img_morph = apply_morphology(img_thresh, kernel_size=4)
+    img_morph = apply_morphology(img_thresh, params=params)
     pipeline_steps.append({
         "step": 8,
         "name": "Morphology Opening",
         "technique": "Noise Removal",
         "description": "Operasi morfologi untuk menghilangkan noise kecil.",
         "image": f"data:image/jpeg;base64,{image_to_base64(img_morph)}",
-        "parameters": {"kernel_size": 4, "operation": "MORPH_OPEN"}
+        "parameters": {"kernel_size": params.morph_kernel_size, "operation": "MORPH_OPEN"}
     })
     
     # Feature Extraction
-    features, contours = extract_shape_features(img_morph, min_area=200)
+    features, contours = extract_shape_features(img_morph, min_area=params.min_contour_area)
     
     # Draw detection result
     result_img = draw_detection_result(img_gray_crop, contours, features)
@@ -314,18 +646,7 @@ def process_sample_image():
     # Build detection results
     detection_results = {
         "knots_detected": len(features),
-        "detections": [
-            {
-                "id": i + 1,
-                "type": "Wood Knot",
-                "confidence": round(0.85 + (f['circularity'] * 0.1), 3),
-                "bbox": f['bbox'],
-                "area": f['area'],
-                "circularity": f['circularity'],
-                "aspect_ratio": f['aspect_ratio']
-            }
-            for i, f in enumerate(features)
-        ],
+        "detections": detections_from_features(features),
         "result_image": f"data:image/jpeg;base64,{image_to_base64(result_img)}"
     }
     
@@ -358,147 +679,631 @@ def process_sample_image():
 # =============================================================================
 
 # Path ke model yang sudah disimpan
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'wood_classifier_rf.pkl')
+MODEL_PATH = os.environ.get("WOOD_MODEL_PATH") or os.path.join(
+    os.path.dirname(__file__), 'wood_classifier_rf.pkl'
+)
+
+# Gunakan representasi forest yang sudah di-compile (lihat forest.py) untuk
+# inferensi. Set WOOD_COMPILED_FOREST=0 untuk selalu memakai sklearn.
+USE_COMPILED_FOREST = os.environ.get("WOOD_COMPILED_FOREST", "1") != "0"
 
-# Cache untuk model (load sekali saja)
-_model_cache = None
+# Mode memory-map untuk model (WOOD_MODEL_MMAP=r). Array forest yang sudah
+# di-compile disimpan di file pendamping dan di-mmap, sehingga semua proses
+# worker berbagi page cache yang sama, bukan menyimpan salinan sendiri.
+MODEL_MMAP_MODE = os.environ.get("WOOD_MODEL_MMAP") or None
+
+# Urutan 4 fitur input model
+CLASSIFICATION_FEATURES = ["num_knots", "total_area", "avg_circularity", "avg_aspect_ratio"]
+
+# Hasil warm_up() terakhir (dilaporkan di /api/health)
+_warmup_info = None
 
 def load_classifier():
     """
-    Load model classifier dari file .pkl.
-    Model di-cache setelah pertama kali load.
+    Model classifier yang aktif.
+    
+    Model di-load sekali lalu disimpan di model registry (lihat
+    registry.py), yang juga menukar model saat file .pkl diganti.
     """
-    global _model_cache
+    from .registry import model_registry
+    return model_registry.get()
+
+
+def load_model_file(model_path):
+    """
+    Load model classifier dari file .pkl.
     
-    if _model_cache is not None:
-        return _model_cache
+    Args:
+        model_path: Path file model (dictionary joblib berisi "model",
+            "class_names" dan metadata opsional)
+        
+    Returns:
+        Dictionary model ditambah fingerprint, load_seconds dan compiled
+    """
+    from .registry import file_fingerprint
     
-    if not os.path.exists(MODEL_PATH):
+    if not os.path.exists(model_path):
         raise FileNotFoundError(
-            f"Model tidak ditemukan di {MODEL_PATH}. "
-            "Silakan train model di Google Colab dan simpan file wood_classifier_rf.pkl ke folder backend/processing/"
+            f"Model tidak ditemukan di {model_path}. "
+            "Silakan train model dengan `python -m processing.train <folder dataset>` "
+            "atau simpan file wood_classifier_rf.pkl ke folder backend/processing/"
         )
     
+    started = time.perf_counter()
+    # Identitas file model, dipakai sebagai bagian key cache hasil
+    fingerprint = file_fingerprint(model_path)
+    
+    model_data = None
+    if MODEL_MMAP_MODE and USE_COMPILED_FOREST:
+        model_data = _load_mmap_model(model_path, fingerprint)
+    if model_data is None:
+        import joblib
+        model_data = joblib.load(model_path, mmap_mode=MODEL_MMAP_MODE)
+        if USE_COMPILED_FOREST:
+            from .forest import compile_forest
+            model_data['compiled'] = compile_forest(model_data['model'])
+            if MODEL_MMAP_MODE and model_data['compiled'] is not None:
+                _save_mmap_model(model_path, fingerprint, model_data)
+    
+    model_data['fingerprint'] = fingerprint
+    model_data['load_seconds'] = time.perf_counter() - started
+    return model_data
+
+
+def _mmap_model_path(model_path, fingerprint):
+    return f"{model_path}.{fingerprint}.compiled"
+
+
+def _load_mmap_model(model_path, fingerprint):
+    """Load forest compiled dari file pendamping (mmap), None jika belum ada."""
+    import joblib
+    path = _mmap_model_path(model_path, fingerprint)
+    if not os.path.exists(path):
+        return None
+    compiled, metadata = joblib.load(path, mmap_mode=MODEL_MMAP_MODE)
+    # Forest compiled punya predict/predict_proba/classes_ seperti model sklearn
+    return dict(metadata, model=compiled, compiled=compiled)
+
+
+def _save_mmap_model(model_path, fingerprint, model_data):
+    """Simpan forest compiled (tanpa kompresi, bisa di-mmap) di samping model."""
     import joblib
-    _model_cache = joblib.load(MODEL_PATH)
-    return _model_cache
+    path = _mmap_model_path(model_path, fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        metadata = {k: v for k, v in model_data.items() if k not in ('model', 'compiled')}
+        joblib.dump((model_data['compiled'], metadata), tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Folder model read-only: tetap jalan dengan salinan di memori
+        return
+    compiled, _ = joblib.load(path, mmap_mode=MODEL_MMAP_MODE)
+    model_data['compiled'] = compiled
+
+
+def warm_up():
+    """
+    Siapkan proses untuk request pertama: load model dan jalankan satu
+    inferensi dummy serta pipeline pada gambar kecil (inisialisasi OpenCV,
+    CLAHE dan buffer thread ini).
+    
+    Returns:
+        Dictionary berisi load_seconds, warmup_seconds dan fingerprint model
+        
+    Raises:
+        FileNotFoundError: Jika file model belum ada
+    """
+    global _warmup_info
+    
+    started = time.perf_counter()
+    model_data = load_classifier()
+    dummy = np.full((64, 64, 3), 128, dtype=np.uint8)
+    Pipeline(reuse_buffers=True).run(dummy)
+    classify_feature_rows([[0, 0, 0.0, 0.0]])
+    
+    _warmup_info = {
+        "fingerprint": model_data['fingerprint'],
+        "load_seconds": round(model_data['load_seconds'], 4),
+        "warmup_seconds": round(time.perf_counter() - started, 4),
+        "mmap": bool(MODEL_MMAP_MODE),
+    }
+    return _warmup_info
 
 
-def preprocess_for_classification(image_path):
+def model_status():
+    """Status model untuk health check (tanpa memicu load)."""
+    from .registry import model_registry, model_info
+    model_data = model_registry.peek()
+    if model_data is None:
+        return {"loaded": False}
+    status = {
+        "loaded": True,
+        "version": model_info(model_data)['version'],
+        "fingerprint": model_data['fingerprint'],
+        "load_seconds": round(model_data['load_seconds'], 4),
+        "mmap": bool(MODEL_MMAP_MODE),
+    }
+    if _warmup_info is not None:
+        status["warmup_seconds"] = _warmup_info["warmup_seconds"]
+    return status
+
+
+def preprocess_for_classification(image_path, params=None):
     """
-    Preprocess gambar untuk klasifikasi (sama dengan pipeline training).
+    Preprocess gambar untuk klasifikasi (sama dengan pipeline training
+    untuk params.decode_mode yang sama, lihat decode_image).
     
     Args:
         image_path: Path ke file gambar
+        params: PipelineParams (default DEFAULT_PARAMS)
         
     Returns:
         Preprocessed image siap untuk ekstraksi fitur
     """
-    img = cv2.imread(image_path)
+    params = params or DEFAULT_PARAMS
+    
+    # 1. Decode kanonik
+    img, _ = decode_image(image_path, params)
     if img is None:
         raise ValueError(f"Gagal membaca gambar: {image_path}")
     
-    # 1. Resize
-    img_resized = resize_keep_aspect(img, max_dim=512)
-    
-    # 2. Grayscale
+    # 2. Resize → grayscale (urutan sama dengan Pipeline.run)
+    img_resized = resize_keep_aspect(img, max_dim=params.resize_max_dim)
     img_gray = cv2.cvtColor(img_resized, cv2.COLOR_BGR2GRAY)
     
     # 3. CLAHE (tanpa auto crop - sesuai dataset baru)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    img_clahe = clahe.apply(img_gray)
+    img_clahe = apply_clahe(img_gray, params=params)
     
     # 4. Gaussian Blur
-    img_blur = cv2.GaussianBlur(img_clahe, (5, 5), 0)
+    img_blur = apply_gaussian_blur(img_clahe, params=params)
     
     return img_blur
 
 
-def extract_classification_features(img_blur):
+def extract_classification_features(img_blur, params=None):
     """
     Ekstraksi fitur untuk klasifikasi (4 fitur shape).
     
     Args:
         img_blur: Preprocessed image
+        params: PipelineParams (default DEFAULT_PARAMS)
         
     Returns:
         List of 4 features: [num_knots, total_area, avg_circularity, avg_aspect_ratio]
     """
+    params = params or DEFAULT_PARAMS
+    
     # Threshold + Morphology
-    _, binary = cv2.threshold(img_blur, 86, 255, cv2.THRESH_BINARY_INV)
-    kernel = np.ones((4, 4), np.uint8)
-    binary_clean = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    binary = apply_threshold(img_blur, params=params)
+    binary_clean = apply_morphology(binary, params=params)
     
     # Find contours
-    contours, _ = cv2.findContours(binary_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    min_area = 200
-    total_area = 0
-    circularities = []
-    aspect_ratios = []
-    num_knots = 0
-    
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area > min_area:
-            num_knots += 1
-            total_area += area
-            perimeter = cv2.arcLength(cnt, True)
-            if perimeter > 0:
-                circularities.append(4 * np.pi * area / (perimeter ** 2))
-            x, y, w, h = cv2.boundingRect(cnt)
-            if h > 0:
-                aspect_ratios.append(float(w) / h)
+    contours = find_contours(binary_clean)
     
-    return [
-        num_knots,
-        total_area,
-        np.mean(circularities) if circularities else 0,
-        np.mean(aspect_ratios) if aspect_ratios else 0
-    ]
+    return classification_features_from_contours(contours, min_area=params.min_contour_area)
+
+
+def classification_features_from_contours(contours, min_area=None):
+    """
+    Hitung 4 fitur klasifikasi dari list kontur.
+    
+    Args:
+        contours: Kontur hasil find_contours
+        min_area: Area minimum kontur yang dihitung sebagai mata kayu
+        
+    Returns:
+        List of 4 features: [num_knots, total_area, avg_circularity, avg_aspect_ratio]
+    """
+    if min_area is None:
+        min_area = DEFAULT_PARAMS.min_contour_area
+    return ContourStats(contours).classification_features(min_area)
+
+
+def classify_features(features, model_data=None):
+    """
+    Klasifikasi dari 4 fitur yang sudah diekstraksi.
+    
+    Args:
+        features: [num_knots, total_area, avg_circularity, avg_aspect_ratio]
+        model_data: Model yang dipakai (default model aktif)
+        
+    Returns:
+        Dictionary berisi hasil klasifikasi
+    """
+    return classify_feature_rows([features], model_data)[0]
+
+
+def classify_feature_rows(feature_rows, model_data=None):
+    """
+    Klasifikasi banyak baris fitur sekaligus dengan satu panggilan model.
+    
+    Args:
+        feature_rows: List of [num_knots, total_area, avg_circularity, avg_aspect_ratio]
+        model_data: Model yang dipakai (default model aktif). Caller yang
+            membuat key cache dari fingerprint model memberikan model yang
+            sama di sini, supaya hot reload di tengah request tidak membuat
+            hasil tersimpan di key yang salah.
+        
+    Returns:
+        List dictionary hasil klasifikasi, urutan sama dengan input
+    """
+    if len(feature_rows) == 0:
+        return []
+    
+    # Load model (pakai versi compiled jika tersedia)
+    model_data = model_data or load_classifier()
+    model = model_data.get('compiled') or model_data['model']
+    class_names = model_data['class_names']
+    
+    # Predict (N x 4 sekaligus)
+    features_array = np.asarray(feature_rows, dtype=np.float64).reshape(len(feature_rows), -1)
+    
+    if hasattr(model, 'predict_proba'):
+        # Satu kali evaluasi forest: kelas dan confidence dari probabilitas yang sama
+        proba = model.predict_proba(features_array)
+        best = proba.argmax(axis=1)
+        predictions = model.classes_[best]
+        confidences = proba[np.arange(len(best)), best]
+    else:
+        predictions = model.predict(features_array)
+        confidences = np.full(len(feature_rows), 0.94)  # Default confidence dari training
+    
+    results = []
+    for features, prediction, confidence in zip(feature_rows, predictions, confidences):
+        results.append({
+            "prediction": int(prediction),
+            "class_name": class_names[prediction],
+            "confidence": round(float(confidence), 3),
+            "features": {
+                "num_knots": features[0],
+                "total_area": features[1],
+                "avg_circularity": round(features[2], 3),
+                "avg_aspect_ratio": round(features[3], 3)
+            }
+        })
+    return results
+
+
+def try_extract_classification_features(image_path, params=None):
+    """
+    Jalankan pipeline untuk satu gambar tanpa melempar error baca.
+    
+    Returns:
+        Tuple (features, error); salah satunya None
+    """
+    try:
+        result = Pipeline(params, reuse_buffers=True).run_path(image_path)
+        return result.classification_features, None
+    except ValueError as e:
+        return None, str(e)
+
+
+def _classify_cache_key(image_path, fingerprint, params=None, namespace="classify"):
+    """
+    Key cache klasifikasi untuk file gambar, None jika cache nonaktif atau
+    file tidak bisa dibaca.
+    """
+    from .cache import result_cache, file_digest, make_key
+    if not result_cache.enabled:
+        return None
+    try:
+        digest = file_digest(image_path)
+    except OSError:
+        return None
+    return make_key(namespace, digest, params or DEFAULT_PARAMS, fingerprint)
+
+
+def _classify_image_uncached(image_path, params=None):
+    from .feature_store import feature_store
+    
+    # Timings ikut dikembalikan karena fungsi ini juga berjalan di proses worker
+    timer = StageTimer()
+    model_data = load_classifier()
+    result = Pipeline(params, reuse_buffers=True).run_path(image_path, timer=timer)
+    feature_store.add_paths([image_path], [result.classification_features], params)
+    with timer.stage("inference"):
+        classification = classify_features(result.classification_features, model_data)
+    classification["timings"] = timer.timings
+    classification["model_fingerprint"] = model_data['fingerprint']
+    return classification
 
 
-def classify_image(image_path):
+def classify_image(image_path, timer=None, params=None):
     """
     Klasifikasi gambar kayu: Cacat atau Tidak Cacat.
     
+    Hasil di-cache berdasarkan hash isi gambar + parameter pipeline (lihat
+    cache.py). Jika worker pool aktif (lihat processing.workers), pekerjaan
+    dijalankan di salah satu proses worker.
+    
     Args:
         image_path: Path ke file gambar
+        timer: StageTimer opsional untuk mencatat durasi tiap tahap
+        params: PipelineParams (default DEFAULT_PARAMS)
         
     Returns:
         Dictionary berisi hasil klasifikasi
     """
-    # Load model
+    from . import workers
+    from .cache import result_cache
+    
+    timer = timer or StageTimer()
+    with timer.stage("cache_lookup"):
+        fingerprint = load_classifier()['fingerprint']
+        key = _classify_cache_key(image_path, fingerprint, params)
+        cached = result_cache.get(key) if key is not None else None
+    if cached is not None:
+        return cached
+    
+    if workers.is_enabled():
+        result = workers.submit_classify(image_path, params).result()
+    else:
+        result = _classify_image_uncached(image_path, params)
+    timer.merge(result.pop("timings"))
+    
+    # Worker yang belum memuat model baru tidak boleh mengisi key model baru
+    if result.pop("model_fingerprint") == fingerprint and key is not None:
+        result_cache.put(key, result)
+    return result
+
+
+def classify_images(image_paths, timer=None, params=None):
+    """
+    Klasifikasi banyak gambar dengan satu panggilan predict_proba.
+    
+    Gambar yang sudah ada di cache langsung diambil dari cache. Fitur
+    gambar lainnya diekstraksi (paralel jika worker pool aktif) lalu
+    ditumpuk menjadi matriks N x 4. Gambar yang gagal dibaca tidak
+    menggagalkan batch; entri hasilnya berisi key "error".
+    
+    Args:
+        image_paths: List path ke file gambar
+        timer: StageTimer opsional untuk mencatat durasi tiap tahap
+            (total seluruh batch)
+        params: PipelineParams (default DEFAULT_PARAMS)
+        
+    Returns:
+        List dictionary hasil klasifikasi, urutan sama dengan image_paths
+    """
+    from . import workers
+    from .cache import result_cache
+    from .feature_store import feature_store
+    
+    timer = timer or StageTimer()
+    results = [None] * len(image_paths)
+    pending = []
     model_data = load_classifier()
-    model = model_data['model']
-    class_names = model_data['class_names']
+    with timer.stage("cache_lookup"):
+        keys = [_classify_cache_key(p, model_data['fingerprint'], params) for p in image_paths]
+        for i, key in enumerate(keys):
+            cached = result_cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
     
-    # Preprocess
-    img_blur = preprocess_for_classification(image_path)
+    pending_paths = [image_paths[i] for i in pending]
+    with timer.stage("extract"):
+        if workers.is_enabled():
+            extracted = workers.extract_features_many(pending_paths, params)
+        else:
+            extracted = [try_extract_classification_features(p, params) for p in pending_paths]
     
-    # Extract features
-    features = extract_classification_features(img_blur)
+    feature_rows = []
+    row_index = []
+    for i, (features, error) in zip(pending, extracted):
+        if error is not None:
+            results[i] = {"error": error}
+        else:
+            feature_rows.append(features)
+            row_index.append(i)
+    feature_store.add_paths([image_paths[i] for i in row_index], feature_rows, params)
     
-    # Predict
-    features_array = np.array(features).reshape(1, -1)
-    prediction = model.predict(features_array)[0]
+    with timer.stage("inference"):
+        classifications = classify_feature_rows(feature_rows, model_data)
+    for i, classification in zip(row_index, classifications):
+        if keys[i] is not None:
+            result_cache.put(keys[i], classification)
+        results[i] = classification
+    return results
+
+
+def _inspect_image_uncached(image_path, params=None):
+    timer = StageTimer()
+    model_data = load_classifier()
+    from .feature_store import feature_store
     
-    # Get probability if available
-    confidence = 0.0
-    if hasattr(model, 'predict_proba'):
-        proba = model.predict_proba(features_array)[0]
-        confidence = float(max(proba))
+    result = Pipeline(params, reuse_buffers=True).run_path(image_path, timer=timer)
+    feature_store.add_paths([image_path], [result.classification_features], params)
+    with timer.stage("inference"):
+        classification = classify_features(result.classification_features, model_data)
+    with timer.stage("detections"):
+        resize_h, resize_w = result.resized.shape[:2]
+        classification["detections"] = detections_from_features(result.features)
+        classification["image_dimensions"] = {"width": resize_w, "height": resize_h}
+    classification["timings"] = timer.timings
+    classification["model_fingerprint"] = model_data['fingerprint']
+    return classification
+
+
+def inspect_image(image_path, timer=None, params=None):
+    """
+    Fast path untuk scanner produksi: klasifikasi + deteksi tanpa visualisasi.
+    
+    Tidak ada gambar tahap yang di-encode dan tidak ada overlay yang digambar;
+    hanya data terstruktur yang dikembalikan.
+    
+    Args:
+        image_path: Path ke file gambar
+        timer: StageTimer opsional untuk mencatat durasi tiap tahap
+        params: PipelineParams (default DEFAULT_PARAMS)
+        
+    Returns:
+        Dictionary hasil klasifikasi (prediction, class_name, confidence,
+        features) ditambah detections (bbox per mata kayu) dan
+        image_dimensions (ukuran gambar setelah resize, acuan bbox)
+    """
+    from . import workers
+    from .cache import result_cache
+    
+    timer = timer or StageTimer()
+    with timer.stage("cache_lookup"):
+        fingerprint = load_classifier()['fingerprint']
+        key = _classify_cache_key(image_path, fingerprint, params, namespace="inspect")
+        cached = result_cache.get(key) if key is not None else None
+    if cached is not None:
+        return cached
+    
+    if workers.is_enabled():
+        result = workers.submit_inspect(image_path, params).result()
     else:
-        confidence = 0.94  # Default confidence dari training
+        result = _inspect_image_uncached(image_path, params)
+    timer.merge(result.pop("timings"))
     
-    return {
-        "prediction": int(prediction),
-        "class_name": class_names[prediction],
-        "confidence": round(confidence, 3),
-        "features": {
-            "num_knots": features[0],
-            "total_area": features[1],
-            "avg_circularity": round(features[2], 3),
-            "avg_aspect_ratio": round(features[3], 3)
-        }
-    }
+    if result.pop("model_fingerprint") == fingerprint and key is not None:
+        result_cache.put(key, result)
+    return result
+
+
+# =============================================================================
+# PIPELINE SINGLE-PASS
+# Setiap tahap dijalankan sekali. Hasil antara disimpan sehingga langkah
+# visualisasi dan fitur Random Forest memakai array yang sama.
+# =============================================================================
+
+class PipelineResult:
+    """
+    Hasil antara dari setiap tahap pipeline.
+    
+    features dan valid_contours (list per mata kayu untuk API) baru dibuat
+    saat pertama kali diakses; jalur klasifikasi cukup memakai stats.
+    """
+    
+    def __init__(self):
+        self.original = None    # BGR (atau grayscale) hasil decode
+        self.original_size = None  # (width, height) gambar asli
+        self.resized = None     # BGR setelah resize
+        self.gray = None
+        self.clahe = None
+        self.blur = None
+        self.thresh = None
+        self.morph = None
+        self.contours = None    # Semua kontur eksternal dari morph
+        self.stats = None       # ContourStats dari semua kontur
+        self.min_area = None
+        self.classification_features = None  # 4 fitur untuk Random Forest
+        self.timings = None     # Durasi tiap tahap (ms), lihat StageTimer
+        self._features = None
+        self._valid_contours = None
+    
+    def _materialize(self):
+        self._features, self._valid_contours = shape_features_from_contours(
+            self.contours, self.min_area, stats=self.stats
+        )
+    
+    @property
+    def features(self):
+        """Fitur per mata kayu (area > min_contour_area)."""
+        if self._features is None:
+            self._materialize()
+        return self._features
+    
+    @property
+    def valid_contours(self):
+        """Kontur yang sesuai dengan features."""
+        if self._valid_contours is None:
+            self._materialize()
+        return self._valid_contours
+
+
+class Pipeline:
+    """
+    Pipeline PCD yang menjalankan setiap tahap tepat satu kali.
+    
+    Contoh:
+        result = Pipeline().run_path(image_path)
+        classify_features(result.classification_features)
+    
+    Dengan reuse_buffers=True, array hasil antara ditulis ke buffer milik
+    PipelineContext thread ini (tanpa alokasi baru). Array tersebut hanya
+    valid sampai pipeline dijalankan lagi di thread yang sama, jadi opsi ini
+    dipakai oleh jalur yang hanya membutuhkan fitur.
+    """
+    
+    def __init__(self, params=None, reuse_buffers=False):
+        self.params = params or DEFAULT_PARAMS
+        self.reuse_buffers = reuse_buffers
+    
+    def run_path(self, image_path, timer=None):
+        """
+        Decode gambar secara kanonik (lihat decode_image) lalu jalankan
+        pipeline. Gambar berwarna (result.original, result.resized) dan
+        fitur berasal dari decode yang sama.
+        """
+        timer = timer or StageTimer()
+        with timer.stage("decode"):
+            img, original_size = decode_image(image_path, self.params)
+        if img is None:
+            raise ValueError(f"Gagal membaca gambar: {image_path}")
+        return self.run(img, timer=timer, original_size=original_size)
+    
+    def run(self, img_bgr, timer=None, original_size=None):
+        """
+        Jalankan resize → gray → CLAHE → blur → threshold → morphology → fitur.
+        
+        Args:
+            img_bgr: Gambar BGR hasil cv2.imread, atau grayscale (tahap
+                gray dilewati dan result.resized sama dengan result.gray)
+            timer: StageTimer opsional; durasi tiap tahap dicatat di sini
+                dan tersedia sebagai result.timings
+            original_size: (width, height) gambar asli jika img_bgr sudah
+                diperkecil saat decode
+            
+        Returns:
+            PipelineResult
+        """
+        params = self.params
+        timer = timer or StageTimer()
+        context = get_context() if self.reuse_buffers else None
+        
+        h, w = img_bgr.shape[:2]
+        new_w, new_h = resized_shape(w, h, params.resize_max_dim)
+        
+        def buffer(name, shape):
+            return context.buffer(name, shape) if context is not None else None
+        
+        result = PipelineResult()
+        result.original = img_bgr
+        result.original_size = original_size or (w, h)
+        result.timings = timer.timings
+        timer.mark()
+        result.resized = resize_keep_aspect(
+            img_bgr,
+            max_dim=params.resize_max_dim,
+            dst=buffer("resized", (new_h, new_w) + img_bgr.shape[2:])
+        )
+        timer.lap("resize")
+        if result.resized.ndim == 2:
+            result.gray = result.resized
+        else:
+            result.gray = cv2.cvtColor(
+                result.resized, cv2.COLOR_BGR2GRAY, dst=buffer("gray", (new_h, new_w))
+            )
+            timer.lap("gray")
+        result.clahe = apply_clahe(result.gray, dst=buffer("clahe", (new_h, new_w)), params=params)
+        timer.lap("clahe")
+        result.blur = apply_gaussian_blur(result.clahe, dst=buffer("blur", (new_h, new_w)), params=params)
+        timer.lap("blur")
+        result.thresh = apply_threshold(result.blur, dst=buffer("thresh", (new_h, new_w)), params=params)
+        timer.lap("threshold")
+        result.morph = apply_morphology(result.thresh, dst=buffer("morph", (new_h, new_w)), params=params)
+        timer.lap("morphology")
+        
+        # Kontur dicari sekali, dipakai untuk fitur visualisasi dan klasifikasi
+        result.min_area = params.min_contour_area
+        result.contours = find_contours(result.morph)
+        timer.lap("contours")
+        result.stats = ContourStats(result.contours)
+        result.classification_features = result.stats.classification_features(result.min_area)
+        timer.lap("features")
+        return result
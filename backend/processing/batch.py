@@ -0,0 +1,236 @@
+"""
+Wood Knots Detection - Batch Processor
+
+Klasifikasi seluruh folder gambar dari command line tanpa lewat HTTP.
+
+Decode + preprocessing berjalan di thread pool dengan jumlah gambar
+"in flight" yang dibatasi (prefetch), inferensi dilakukan per batch, dan
+hasil langsung ditulis ke file CSV/JSONL sesuai urutan. Memori tetap datar
+berapa pun jumlah gambar di dataset.
+
+Jika file output sudah ada, gambar yang sudah berhasil diklasifikasi
+dilewati (resume). Gambar yang sebelumnya gagal dicoba lagi; baris
+barunya ditambahkan setelah baris error lama.
+
+Contoh (dari folder backend):
+    python -m processing.batch "dataset/Images - 1" -o hasil.jsonl
+    python -m processing.batch /data/boards -o hasil.csv --threads 8 --prefetch 64
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+
+CSV_FIELDS = [
+    "path", "prediction", "class_name", "confidence",
+    "num_knots", "total_area", "avg_circularity", "avg_aspect_ratio", "error"
+]
+
+
+def iter_images(root):
+    """Telusuri folder secara rekursif (lazy, urutan nama file) dan yield path gambar."""
+    try:
+        entries = sorted(os.scandir(root), key=lambda e: e.name)
+    except NotADirectoryError:
+        yield root
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_images(entry.path)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+
+
+def extract_features(image_path):
+    """Decode + preprocessing + ekstraksi 4 fitur untuk satu gambar."""
+    from . import preprocess_for_classification, extract_classification_features
+    img_blur = preprocess_for_classification(image_path)
+    return extract_classification_features(img_blur)
+
+
+def _prepare_output(path, fmt):
+    """
+    Baca path yang sudah berhasil diproses dari output lama (untuk resume).
+
+    Baris error tidak dihitung sehingga gambarnya dicoba lagi. Baris
+    terakhir yang terpotong (proses terhenti saat menulis) dibuang.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                if not row.get('error'):
+                    done.add(row['path'])
+        else:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    if 'error' not in row:
+                        done.add(row['path'])
+    return done
+
+
+class ResultWriter:
+    """Tulis hasil ke CSV atau JSONL secara streaming."""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if is_new:
+                self.csv.writeheader()
+
+    def write(self, image_path, result):
+        if self.fmt == 'csv':
+            row = {"path": image_path, "error": result.get("error", "")}
+            if "error" not in result:
+                row.update({
+                    "prediction": result["prediction"],
+                    "class_name": result["class_name"],
+                    "confidence": result["confidence"],
+                    **result["features"]
+                })
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps({"path": image_path, **result}, default=float) + "\n")
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def run_batch(root, output, fmt=None, threads=None, prefetch=32, batch_size=64, progress=True):
+    """
+    Klasifikasi semua gambar di bawah root dan tulis hasil ke output.
+
+    Args:
+        root: Folder dataset (atau satu file gambar)
+        output: Path file hasil (.csv atau .jsonl)
+        fmt: "csv" / "jsonl" (default dari ekstensi output)
+        threads: Jumlah thread decode/preprocessing (default jumlah core)
+        prefetch: Maksimal gambar yang sedang diproses sekaligus
+        batch_size: Jumlah gambar per panggilan model
+        progress: Tampilkan progres ke stderr
+
+    Returns:
+        Dictionary ringkasan (processed = berhasil, skipped, errors, seconds)
+    """
+    from . import load_classifier, classify_feature_rows
+    from .feature_store import feature_store
+
+    if fmt is None:
+        fmt = 'csv' if output.lower().endswith('.csv') else 'jsonl'
+    threads = threads or os.cpu_count() or 1
+    prefetch = max(prefetch, threads)
+
+    # Load model di awal supaya error model muncul sebelum membaca dataset
+    load_classifier()
+
+    done = _prepare_output(output, fmt)
+    writer = ResultWriter(output, fmt)
+    stats = {"processed": 0, "skipped": 0, "errors": 0}
+    started = time.perf_counter()
+
+    pending_paths = []
+    pending_rows = []
+
+    def flush_batch():
+        feature_store.add_paths(pending_paths, pending_rows)
+        for image_path, classification in zip(pending_paths, classify_feature_rows(pending_rows)):
+            writer.write(image_path, classification)
+        pending_paths.clear()
+        pending_rows.clear()
+        writer.flush()
+
+    def collect(image_path, future):
+        try:
+            features = future.result()
+        except Exception as e:
+            # Jaga urutan output: tulis batch yang tertunda dulu
+            flush_batch()
+            writer.write(image_path, {"error": str(e)})
+            stats["errors"] += 1
+        else:
+            pending_paths.append(image_path)
+            pending_rows.append(features)
+            if len(pending_rows) >= batch_size:
+                flush_batch()
+            stats["processed"] += 1
+        total = stats["processed"] + stats["errors"]
+        if progress and total % 500 == 0:
+            rate = total / (time.perf_counter() - started)
+            print(f"{total} gambar, {stats['errors']} gagal ({rate:.1f}/s)", file=sys.stderr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            in_flight = deque()
+            for image_path in iter_images(root):
+                if image_path in done:
+                    stats["skipped"] += 1
+                    continue
+                in_flight.append((image_path, pool.submit(extract_features, image_path)))
+                if len(in_flight) >= prefetch:
+                    collect(*in_flight.popleft())
+            while in_flight:
+                collect(*in_flight.popleft())
+        flush_batch()
+    finally:
+        writer.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Klasifikasi semua gambar kayu di sebuah folder (Cacat / Tidak Cacat)."
+    )
+    parser.add_argument("root", help="Folder dataset atau file gambar")
+    parser.add_argument("-o", "--output", required=True, help="File hasil (.csv atau .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Format output (default dari ekstensi)")
+    parser.add_argument("--threads", type=int, help="Jumlah thread decode (default jumlah core)")
+    parser.add_argument("--prefetch", type=int, default=32, help="Maksimal gambar in-flight")
+    parser.add_argument("--batch-size", type=int, default=64, help="Gambar per panggilan model")
+    parser.add_argument("--model", help="Path model .pkl (default processing/wood_classifier_rf.pkl)")
+    parser.add_argument("--quiet", action="store_true", help="Tanpa progres di stderr")
+    args = parser.parse_args(argv)
+
+    import processing
+    if args.model:
+        processing.MODEL_PATH = args.model
+
+    stats = run_batch(
+        args.root,
+        args.output,
+        fmt=args.format,
+        threads=args.threads,
+        prefetch=args.prefetch,
+        batch_size=args.batch_size,
+        progress=not args.quiet,
+    )
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Wood Knots Detection - Result Cache
+
+Cache hasil processing yang di-address berdasarkan isi gambar. Key dibentuk
+dari hash SHA-256 bytes gambar ditambah hash parameter CONFIG yang berlaku
+(dan identitas model), sehingga gambar identik yang diupload dua kali
+memakai hasil yang sama, sedangkan perubahan parameter otomatis membuat
+key baru.
+
+Dua tingkat penyimpanan:
+1. Memori  - LRU dengan batas total ukuran (bytes JSON)
+2. Disk    - opsional, satu file JSON per key, juga dibatasi ukuran
+
+Konfigurasi lewat environment variable:
+    WOOD_CACHE_MAX_MB       batas tier memori (default 256, 0 = nonaktif)
+    WOOD_CACHE_DIR          folder tier disk (default kosong = nonaktif)
+    WOOD_CACHE_DISK_MAX_MB  batas tier disk (default 2048)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def _json_default(value):
+    """Serialisasi scalar/array NumPy ke tipe Python."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def bytes_digest(data):
+    """Hash SHA-256 dari bytes gambar."""
+    return hashlib.sha256(data).hexdigest()
+
+
+# Memo hash file berdasarkan (path, size, mtime) agar cache hit tidak
+# perlu membaca ulang file besar
+_file_digest_memo = OrderedDict()
+_file_digest_lock = threading.Lock()
+_FILE_DIGEST_MEMO_SIZE = 4096
+
+
+def file_digest(path):
+    """Hash SHA-256 dari isi file, di-memo per (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    with _file_digest_lock:
+        digest = _file_digest_memo.get(memo_key)
+        if digest is not None:
+            _file_digest_memo.move_to_end(memo_key)
+            return digest
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _file_digest_lock:
+        _file_digest_memo[memo_key] = digest
+        if len(_file_digest_memo) > _FILE_DIGEST_MEMO_SIZE:
+            _file_digest_memo.popitem(last=False)
+    return digest
+
+
+def config_digest(config):
+    """Hash parameter pipeline (dictionary atau PipelineParams; urutan key tidak berpengaruh)."""
+    if hasattr(config, 'to_dict'):
+        config = config.to_dict()
+    encoded = json.dumps(config, sort_keys=True, default=_json_default)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def make_key(namespace, image_digest, config, extra=None):
+    """
+    Bentuk key cache.
+
+    Args:
+        namespace: Jenis hasil, misalnya "classify" atau "process"
+        image_digest: Hash isi gambar (file_digest / bytes_digest)
+        config: Parameter pipeline yang berlaku (PipelineParams atau dictionary)
+        extra: Komponen tambahan (misalnya identitas model)
+    """
+    parts = [namespace, image_digest, config_digest(config)]
+    if extra is not None:
+        parts.append(str(extra))
+    return ':'.join(parts)
+
+
+class ResultCache:
+    """
+    Cache LRU dengan eviction berdasarkan ukuran dan tier disk opsional.
+
+    Nilai disimpan sebagai JSON bytes; get() selalu mengembalikan salinan
+    baru sehingga pemanggil bebas memodifikasi hasilnya.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_index = OrderedDict()
+        self._disk_size = 0
+        if disk_dir:
+            self._load_disk_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    def get(self, key):
+        """Ambil nilai dari cache, None jika tidak ada."""
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(blob)
+
+        blob = self._disk_get(key)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, blob)
+        return json.loads(blob)
+
+    def put(self, key, value):
+        """Simpan nilai (harus bisa di-serialize ke JSON)."""
+        if not self.enabled:
+            return
+        blob = json.dumps(value, default=_json_default).encode('utf-8')
+        with self._lock:
+            self._memory_put(key, blob)
+        self._disk_put(key, blob)
+
+    def clear(self):
+        """Kosongkan tier memori."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_size,
+            }
+
+    # -- tier memori ---------------------------------------------------------
+
+    def _memory_put(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = blob
+        self._size += len(blob)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    # -- tier disk -----------------------------------------------------------
+
+    def _disk_path(self, key):
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.json")
+
+    def _load_disk_index(self):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith('.json'):
+                    st = os.stat(os.path.join(root, name))
+                    files.append((st.st_mtime, os.path.join(root, name), st.st_size))
+        for _, path, size in sorted(files):
+            self._disk_index[path] = size
+            self._disk_size += size
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            if path in self._disk_index:
+                self._disk_index.move_to_end(path)
+        return blob
+
+    def _disk_put(self, key, blob):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+        evict = []
+        with self._lock:
+            self._disk_size -= self._disk_index.pop(path, 0)
+            self._disk_index[path] = len(blob)
+            self._disk_size += len(blob)
+            while self.disk_max_bytes and self._disk_size > self.disk_max_bytes and len(self._disk_index) > 1:
+                old_path, size = self._disk_index.popitem(last=False)
+                self._disk_size -= size
+                evict.append(old_path)
+        for old_path in evict:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+def cache_from_env():
+    """Buat ResultCache dari environment variable (lihat docstring modul)."""
+    max_mb = float(os.environ.get('WOOD_CACHE_MAX_MB', '256'))
+    disk_dir = os.environ.get('WOOD_CACHE_DIR') or None
+    disk_max_mb = float(os.environ.get('WOOD_CACHE_DISK_MAX_MB', '2048'))
+    return ResultCache(
+        max_bytes=int(max_mb * 1024 * 1024),
+        disk_dir=disk_dir,
+        disk_max_bytes=int(disk_max_mb * 1024 * 1024),
+    )
+
+
+# Instance bersama untuk processing dan app
+result_cache = cache_from_env()
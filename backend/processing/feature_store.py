@@ -0,0 +1,485 @@
+"""
+Wood Knots Detection - Feature Store
+
+Menyimpan 4 fitur klasifikasi setiap gambar yang sudah diproses ke disk,
+sehingga model baru bisa dilatih ulang atau dipakai untuk menilai ulang
+arsip gambar tanpa decode dan preprocessing ulang.
+
+Format: satu file biner append-only berisi record fixed-width 72 byte
+(SHA-256 isi gambar 32 byte, hash parameter pipeline 8 byte, 4 fitur
+float64). File dibaca dengan np.memmap; setiap kolom (digest, params,
+features) adalah view tanpa salinan. Setiap append adalah satu os.write
+dengan O_APPEND, sehingga aman ditulis bersamaan oleh beberapa proses
+(worker pool, worker gunicorn). Record yang sama bisa muncul lebih dari
+sekali; saat dibaca, record terakhir per (gambar, parameter) yang dipakai.
+
+File tidak pernah diubah saat dibuka. Pembaca hanya memakai record utuh
+(ukuran file // 72), sehingga record yang sedang ditulis proses lain
+diabaikan. Jika proses mati di tengah append dan meninggalkan record
+terpotong, append berikutnya ditolak (record baru akan bergeser) sampai
+`repair` dijalankan; repair dan append memakai lock file (flock) yang sama.
+
+Isi parameter untuk setiap hash disimpan di params/<hash>.json.
+
+Store terisi otomatis saat gambar diklasifikasi (classify_image,
+classify_images, /api/process, processing.batch) jika diaktifkan lewat
+environment variable:
+    WOOD_FEATURE_STORE_DIR  folder feature store (default kosong = nonaktif)
+
+CLI (dari folder backend):
+    python -m processing.feature_store add dataset/ --store features/
+    python -m processing.feature_store rescore --store features/ \\
+        --model model_baru.pkl -o hasil.csv
+    python -m processing.feature_store stats --store features/
+    python -m processing.feature_store repair --store features/
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .cache import config_digest, file_digest
+
+try:
+    import fcntl
+except ImportError:  # Windows: tanpa lock antar proses
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# v2: fitur selalu dari decode kanonik (decode_image, decode_mode ikut
+# hash parameter); record v1 bisa berasal dari decode campuran dan tidak
+# dibaca lagi
+RECORDS_FILE = "features.v2.bin"
+
+# key = digest + params (dipakai untuk deduplikasi)
+RECORD_DTYPE = np.dtype({
+    "names": ["key", "digest", "params", "features"],
+    "formats": ["V40", "V32", "V8", ("<f8", (4,))],
+    "offsets": [0, 0, 32, 40],
+    "itemsize": 72,
+})
+_WRITE_DTYPE = np.dtype([("key", "V40"), ("features", "<f8", (4,))])
+
+
+@contextmanager
+def _locked(fd):
+    """Lock eksklusif antar proses pada file feature store."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def params_digest(params=None):
+    """Hash 8 byte parameter pipeline (sama dengan config_digest)."""
+    from . import DEFAULT_PARAMS
+    return bytes.fromhex(config_digest(params or DEFAULT_PARAMS))
+
+
+class FeatureStore:
+    """
+    Feature store di satu folder. Tanpa folder, store nonaktif dan semua
+    penulisan diabaikan.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._fd = None
+        self._pid = None
+        self._known_params = set()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(os.path.join(directory, "params"), exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, RECORDS_FILE)
+
+    def __len__(self):
+        if not self.enabled:
+            return 0
+        try:
+            return os.path.getsize(self.path) // RECORD_DTYPE.itemsize
+        except OSError:
+            return 0
+
+    # ========================================
+    # Penulisan
+    # ========================================
+
+    def append(self, digests, feature_rows, params=None):
+        """
+        Tambahkan banyak baris fitur sekaligus (satu kali write).
+
+        Args:
+            digests: List hash SHA-256 (hex) isi gambar
+            feature_rows: List of [num_knots, total_area, avg_circularity, avg_aspect_ratio]
+            params: PipelineParams yang dipakai saat ekstraksi (default DEFAULT_PARAMS)
+
+        Returns:
+            Jumlah baris yang ditulis
+        """
+        if not self.enabled or len(digests) == 0:
+            return 0
+        params_key = params_digest(params)
+        self._write_params(params_key, params)
+        records = np.empty(len(digests), _WRITE_DTYPE)
+        records["key"] = [bytes.fromhex(digest) + params_key for digest in digests]
+        records["features"] = np.asarray(feature_rows, dtype=np.float64).reshape(len(digests), 4)
+        data = records.tobytes()
+        with self._lock:
+            fd = self._open()
+            with _locked(fd):
+                # Di bawah lock ukuran file stabil: ekor terpotong berarti
+                # append sebelumnya gagal, bukan sedang berjalan
+                if os.fstat(fd).st_size % RECORD_DTYPE.itemsize:
+                    raise OSError(
+                        f"Feature store {self.path} berisi record terpotong; "
+                        "jalankan `python -m processing.feature_store repair`"
+                    )
+                written = os.write(fd, data)
+        if written != len(data):
+            raise OSError(f"Penulisan feature store terpotong ({written}/{len(data)} byte)")
+        return len(digests)
+
+    def add_paths(self, image_paths, feature_rows, params=None):
+        """
+        Seperti append(), dengan hash dihitung dari file gambar. Tidak
+        pernah melempar error: kegagalan store tidak boleh menggagalkan
+        klasifikasi.
+        """
+        if not self.enabled:
+            return 0
+        try:
+            return self.append([file_digest(p) for p in image_paths], feature_rows, params)
+        except (OSError, ValueError):
+            logger.warning("Gagal menulis feature store di %s", self.directory, exc_info=True)
+            return 0
+
+    def _open(self):
+        # fd per proses (aman setelah fork); file tidak diubah saat dibuka
+        if self._pid != os.getpid():
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            self._fd = os.open(self.path, flags, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def repair(self):
+        """
+        Buang record terpotong di ekor file (proses mati saat append).
+
+        Operasi maintenance eksplisit: berjalan di bawah lock yang sama
+        dengan append, sehingga tidak memotong record yang sedang ditulis.
+
+        Returns:
+            Jumlah byte yang dibuang
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return 0
+        fd = os.open(self.path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        try:
+            with _locked(fd):
+                size = os.fstat(fd).st_size
+                partial = size % RECORD_DTYPE.itemsize
+                if partial:
+                    os.ftruncate(fd, size - partial)
+        finally:
+            os.close(fd)
+        return partial
+
+    def _write_params(self, params_key, params):
+        if params_key in self._known_params:
+            return
+        from . import DEFAULT_PARAMS
+        path = os.path.join(self.directory, "params", f"{params_key.hex()}.json")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump((params or DEFAULT_PARAMS).to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+        self._known_params.add(params_key)
+
+    # ========================================
+    # Pembacaan
+    # ========================================
+
+    def records(self):
+        """Semua record (memory-mapped, read-only) sesuai urutan penulisan."""
+        count = len(self)
+        if count == 0:
+            return np.zeros(0, RECORD_DTYPE)
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+
+    def select(self, params=None, latest=True):
+        """
+        Record untuk satu set parameter.
+
+        Args:
+            params: PipelineParams (default DEFAULT_PARAMS)
+            latest: Hanya record terakhir per gambar
+
+        Returns:
+            Array record (salinan), urutan penulisan
+        """
+        records = self.records()
+        records = records[records["params"] == np.void(params_digest(params))]
+        if latest and len(records):
+            # Index kemunculan terakhir setiap key (np.unique memberi yang pertama)
+            _, last = np.unique(records["key"][::-1], return_index=True)
+            records = records[np.sort(len(records) - 1 - last)]
+        return records
+
+    def lookup(self, digests, params=None):
+        """
+        Fitur tersimpan untuk daftar hash gambar.
+
+        Returns:
+            Array (len(digests), 4); baris yang tidak ada di store berisi NaN
+        """
+        records = self.select(params)
+        index = {bytes(digest): i for i, digest in enumerate(records["digest"])}
+        result = np.full((len(digests), 4), np.nan)
+        for i, digest in enumerate(digests):
+            row = index.get(bytes.fromhex(digest))
+            if row is not None:
+                result[i] = records["features"][row]
+        return result
+
+    def params_sets(self):
+        """Dictionary hash parameter (hex) -> dictionary parameter."""
+        result = {}
+        folder = os.path.join(self.directory, "params")
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".json"):
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    result[name[:-5]] = json.load(f)
+        return result
+
+    def stats(self):
+        records = self.records()
+        params_keys, counts = np.unique(records["params"], return_counts=True)
+        return {
+            "directory": self.directory,
+            "records": len(records),
+            "bytes": len(records) * RECORD_DTYPE.itemsize,
+            "params": {bytes(key).hex(): int(count) for key, count in zip(params_keys, counts)},
+        }
+
+
+def rescore(store, model_data=None, params=None, chunk_rows=262144):
+    """
+    Klasifikasi ulang semua gambar di store dengan model (tanpa decode).
+
+    Args:
+        store: FeatureStore
+        model_data: Model yang dipakai (default model aktif)
+        params: Set parameter fitur yang dinilai (default DEFAULT_PARAMS)
+        chunk_rows: Jumlah baris per panggilan model
+
+    Yields:
+        Tuple (digests, predictions, confidences, features) per chunk;
+        digests berupa list hex, sisanya array NumPy
+    """
+    from . import load_classifier
+
+    model_data = model_data or load_classifier()
+    model = model_data.get('compiled') or model_data['model']
+    records = store.select(params)
+    for start in range(0, len(records), chunk_rows):
+        chunk = records[start:start + chunk_rows]
+        features = np.ascontiguousarray(chunk["features"])
+        proba = model.predict_proba(features)
+        best = proba.argmax(axis=1)
+        yield (
+            [bytes(digest).hex() for digest in chunk["digest"]],
+            model.classes_[best],
+            proba[np.arange(len(best)), best],
+            features,
+        )
+
+
+def feature_store_from_env():
+    """Buat FeatureStore dari environment variable (lihat docstring modul)."""
+    return FeatureStore(os.environ.get("WOOD_FEATURE_STORE_DIR") or None)
+
+
+# Instance bersama untuk processing dan app
+feature_store = feature_store_from_env()
+
+
+# ========================================
+# CLI
+# ========================================
+
+def add_images(store, root, params=None, threads=None, prefetch=32, batch_size=256, progress=True):
+    """
+    Ekstraksi fitur semua gambar di bawah root dan append ke store.
+    Gambar yang fiturnya (untuk params ini) sudah ada di store dilewati.
+
+    Returns:
+        Dictionary ringkasan (added, skipped, errors, seconds)
+    """
+    from . import try_extract_classification_features
+    from .batch import iter_images
+
+    threads = threads or os.cpu_count() or 1
+    prefetch = max(prefetch, threads)
+    existing = {bytes(digest) for digest in store.select(params)["digest"]}
+    stats = {"added": 0, "skipped": 0, "errors": 0}
+    started = time.perf_counter()
+    pending_digests = []
+    pending_rows = []
+
+    def extract(image_path):
+        digest = file_digest(image_path)
+        if bytes.fromhex(digest) in existing:
+            return digest, None, None
+        features, error = try_extract_classification_features(image_path, params)
+        return digest, features, error
+
+    def collect(image_path, future):
+        try:
+            digest, features, error = future.result()
+        except OSError as e:
+            digest, features, error = None, None, str(e)
+        if error is not None:
+            stats["errors"] += 1
+            if progress:
+                print(f"{image_path}: {error}", file=sys.stderr)
+        elif features is None:
+            stats["skipped"] += 1
+        else:
+            existing.add(bytes.fromhex(digest))
+            pending_digests.append(digest)
+            pending_rows.append(features)
+            if len(pending_rows) >= batch_size:
+                stats["added"] += store.append(pending_digests, pending_rows, params)
+                pending_digests.clear()
+                pending_rows.clear()
+        done = stats["added"] + len(pending_rows) + stats["skipped"] + stats["errors"]
+        if progress and done % 1000 == 0:
+            rate = done / (time.perf_counter() - started)
+            print(f"{done} gambar ({rate:.1f}/s)", file=sys.stderr)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        in_flight = deque()
+        for image_path in iter_images(root):
+            in_flight.append((image_path, pool.submit(extract, image_path)))
+            if len(in_flight) >= prefetch:
+                collect(*in_flight.popleft())
+        while in_flight:
+            collect(*in_flight.popleft())
+    stats["added"] += store.append(pending_digests, pending_rows, params)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def write_rescore(store, output, model_data=None, params=None):
+    """
+    Tulis hasil rescore() ke CSV / JSONL (dari ekstensi output).
+
+    Returns:
+        Dictionary ringkasan (rows, per kelas, seconds)
+    """
+    from . import CLASSIFICATION_FEATURES, load_classifier
+
+    model_data = model_data or load_classifier()
+    class_names = model_data['class_names']
+    counts = dict.fromkeys(class_names, 0)
+    started = time.perf_counter()
+    as_csv = output.lower().endswith(".csv")
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if as_csv:
+            writer.writerow(["digest", "prediction", "class_name", "confidence", *CLASSIFICATION_FEATURES])
+        for digests, predictions, confidences, features in rescore(store, model_data, params):
+            for digest, prediction, confidence, row in zip(
+                digests, predictions.tolist(), confidences.tolist(), features.tolist()
+            ):
+                class_name = class_names[prediction]
+                counts[class_name] += 1
+                if as_csv:
+                    writer.writerow([digest, prediction, class_name, round(confidence, 3), *row])
+                else:
+                    f.write(json.dumps({
+                        "digest": digest,
+                        "prediction": prediction,
+                        "class_name": class_name,
+                        "confidence": round(confidence, 3),
+                        "features": dict(zip(CLASSIFICATION_FEATURES, row)),
+                    }) + "\n")
+    return {
+        "rows": sum(counts.values()),
+        "classes": counts,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Feature store fitur klasifikasi kayu.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Ekstraksi fitur folder gambar ke store")
+    add.add_argument("root", help="Folder dataset atau file gambar")
+    add.add_argument("--threads", type=int, help="Jumlah thread (default jumlah core)")
+    add.add_argument("--prefetch", type=int, default=32, help="Maksimal gambar in-flight")
+
+    score = commands.add_parser("rescore", help="Klasifikasi ulang isi store dengan model")
+    score.add_argument("-o", "--output", required=True, help="File hasil (.csv atau .jsonl)")
+    score.add_argument("--model", help="Path model .pkl (default processing/wood_classifier_rf.pkl)")
+
+    commands.add_parser("stats", help="Ringkasan isi store")
+    commands.add_parser("repair", help="Buang record terpotong di ekor file store")
+
+    for command in commands.choices.values():
+        command.add_argument("--store", default=os.environ.get("WOOD_FEATURE_STORE_DIR"),
+                             help="Folder feature store (default WOOD_FEATURE_STORE_DIR)")
+        command.add_argument("--params", help="JSON override parameter pipeline (default CONFIG)")
+    args = parser.parse_args(argv)
+
+    if not args.store:
+        parser.error("Folder store belum diisi (--store atau WOOD_FEATURE_STORE_DIR)")
+    import processing
+    try:
+        params = processing.DEFAULT_PARAMS.replace(**json.loads(args.params)) if args.params else None
+    except ValueError as e:
+        parser.error(f"--params tidak valid: {e}")
+    store = FeatureStore(args.store)
+
+    if args.command == "add":
+        result = add_images(store, args.root, params, threads=args.threads, prefetch=args.prefetch)
+    elif args.command == "rescore":
+        if args.model:
+            processing.MODEL_PATH = args.model
+        result = write_rescore(store, args.output, params=params)
+    elif args.command == "repair":
+        result = {"removed_bytes": store.repair(), "rows": len(store)}
+    else:
+        result = store.stats()
+        result["params_sets"] = store.params_sets()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Wood Knots Detection - Compiled Random Forest
+
+Representasi array datar dari RandomForestClassifier sklearn untuk inferensi
+cepat. Semua pohon digabung ke satu set array (children, feature, threshold,
+value) dan ditelusuri sekaligus untuk semua sampel dengan NumPy, tanpa
+validasi input sklearn di setiap panggilan.
+
+Hasil predict_proba identik dengan sklearn: input di-cast ke float32 seperti
+yang dilakukan sklearn sebelum dibandingkan dengan threshold node.
+"""
+
+import numpy as np
+
+
+class CompiledForest:
+    """
+    Forest yang sudah di-flatten ke array NumPy.
+
+    Atribut classes_ dan method predict/predict_proba mengikuti API sklearn
+    sehingga bisa dipakai sebagai pengganti model di classify_feature_rows.
+    """
+
+    def __init__(self, model):
+        trees = [est.tree_ for est in model.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+
+        left, right, feature, threshold, value = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            is_leaf = tree.children_left == -1
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            # Leaf memakai feature 0 agar indexing tetap valid (hasilnya diabaikan)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # Normalisasi count per leaf menjadi probabilitas
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1
+            value.append(counts / totals)
+
+        self.classes_ = np.asarray(model.classes_)
+        self.n_features_in_ = model.n_features_in_
+        self.roots = offsets.astype(np.intp)
+        self.children_left = np.concatenate(left).astype(np.intp)
+        self.children_right = np.concatenate(right).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.value = np.concatenate(value)
+        self.max_depth = max(int(est.tree_.max_depth) for est in model.estimators_)
+
+    def predict_proba(self, X):
+        """Probabilitas kelas rata-rata dari semua pohon (N x n_classes)."""
+        # sklearn membandingkan fitur sebagai float32
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+
+        for _ in range(self.max_depth):
+            left = self.children_left[node]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            next_node = np.where(go_left, left, self.children_right[node])
+            node = np.where(internal, next_node, node)
+
+        return self.value[node].mean(axis=1)
+
+    def predict(self, X):
+        """Label kelas dengan probabilitas tertinggi."""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def compile_forest(model):
+    """
+    Compile model menjadi CompiledForest jika didukung.
+
+    Returns:
+        CompiledForest, atau None jika model bukan forest klasifikasi
+        single-output (misalnya pipeline sklearn atau model lain)
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if not estimators or not hasattr(model, 'classes_'):
+        return None
+    if getattr(model, 'n_outputs_', 1) != 1:
+        return None
+    if not all(hasattr(est, 'tree_') for est in estimators):
+        return None
+    return CompiledForest(model)
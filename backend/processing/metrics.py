@@ -0,0 +1,263 @@
+"""
+Wood Knots Detection - Metrics
+
+Pengukuran waktu per tahap pipeline dan agregasinya menjadi histogram
+latency yang diekspos dalam format teks Prometheus (lihat /api/metrics).
+
+StageTimer mencatat durasi setiap tahap satu request (dalam milidetik)
+untuk blok "timings" di response. Registry menyimpan histogram dan gauge
+untuk seluruh proses server.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Batas bucket histogram (detik)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class StageTimer:
+    """Catat durasi (ms) setiap tahap dalam satu request."""
+
+    def __init__(self):
+        self.timings = {}
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def mark(self):
+        """Mulai hitungan lap berikutnya dari sekarang."""
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Catat waktu sejak lap sebelumnya sebagai durasi stage."""
+        now = time.perf_counter()
+        self.add(stage, (now - self._last) * 1000)
+        self._last = now
+
+    @contextmanager
+    def stage(self, stage):
+        """Context manager untuk mengukur satu tahap."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.add(stage, (now - start) * 1000)
+            self._last = now
+
+    def add(self, stage, ms):
+        """Tambahkan durasi (ms); tahap yang sama dijumlahkan."""
+        self.timings[stage] = self.timings.get(stage, 0.0) + ms
+
+    def merge(self, timings):
+        """Gabungkan timings dari timer lain (misalnya dari proses worker)."""
+        for stage, ms in (timings or {}).items():
+            if stage != "total":
+                self.add(stage, ms)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def result(self):
+        """Timings yang dibulatkan ditambah total sejak timer dibuat."""
+        timings = {stage: round(ms, 3) for stage, ms in self.timings.items()}
+        timings["total"] = round(self.elapsed_ms(), 3)
+        return timings
+
+
+class Histogram:
+    """Histogram kumulatif bergaya Prometheus."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    inner = ",".join(f'{key}="{_escape(value)}"' for key, value in items)
+    return "{" + inner + "}"
+
+
+class Registry:
+    """Kumpulan histogram, counter dan gauge milik proses server."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}   # name -> {labels: Histogram}
+        self._collectors = {}   # name -> (kind, callable)
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        """Tambahkan observasi ke histogram name{labels}."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def collector(self, name, fn, kind="gauge", help_text=None):
+        """
+        Daftarkan metrik yang nilainya dibaca saat scrape.
+
+        Args:
+            name: Nama metrik
+            fn: Callable tanpa argumen yang mengembalikan angka, dictionary
+                {labels_tuple: angka}, atau None (metrik dilewati)
+            kind: "gauge" atau "counter"
+            help_text: Deskripsi untuk baris # HELP
+        """
+        self._collectors[name] = (kind, fn)
+        if help_text:
+            self._help[name] = help_text
+
+    def render(self):
+        """Format teks Prometheus (text/plain; version=0.0.4)."""
+        lines = []
+        with self._lock:
+            histograms = {
+                name: {labels: (list(h.counts), h.count, h.sum, h.buckets) for labels, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        for name in sorted(histograms):
+            self._header(lines, name, "histogram")
+            for labels, (counts, count, total, buckets) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name in sorted(self._collectors):
+            kind, fn = self._collectors[name]
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            self._header(lines, name, kind)
+            if isinstance(value, dict):
+                for labels, v in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {v}")
+            else:
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name, kind):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def observe_request(endpoint, method, status, seconds):
+    """Catat durasi satu request HTTP."""
+    registry.observe(
+        "wood_http_request_duration_seconds", seconds,
+        endpoint=endpoint, method=method, status=status
+    )
+
+
+# =============================================================================
+# METRIK BAWAAN
+# Dibaca saat scrape dari cache hasil, worker pool dan model yang aktif.
+# =============================================================================
+
+def _cache_stats():
+    from .cache import result_cache
+    return result_cache.stats()
+
+
+def _cache_hit_ratio():
+    stats = _cache_stats()
+    hits = stats["hits"] + stats["disk_hits"]
+    lookups = hits + stats["misses"]
+    return round(hits / lookups, 6) if lookups else None
+
+
+def _model_load_seconds():
+    from .registry import model_registry
+    model_data = model_registry.peek()
+    if model_data is None:
+        return None
+    return round(model_data["load_seconds"], 6)
+
+
+def _model_reloads():
+    from .registry import model_registry
+    return model_registry.reloads
+
+
+def _queue_depth():
+    from .workers import queue_depth
+    return queue_depth()
+
+
+def _pool_size():
+    from .workers import pool_size
+    return pool_size()
+
+
+registry = Registry()
+registry.describe("wood_stage_duration_seconds", "Durasi tiap tahap pipeline")
+registry.describe("wood_http_request_duration_seconds", "Durasi request HTTP per endpoint")
+
+registry.collector("wood_cache_hits_total", lambda: _cache_stats()["hits"], "counter",
+                   "Cache hit di memori")
+registry.collector("wood_cache_disk_hits_total", lambda: _cache_stats()["disk_hits"], "counter",
+                   "Cache hit di disk")
+registry.collector("wood_cache_misses_total", lambda: _cache_stats()["misses"], "counter",
+                   "Cache miss")
+registry.collector("wood_cache_hit_ratio", _cache_hit_ratio, "gauge",
+                   "Rasio hit (memori + disk) terhadap semua lookup")
+registry.collector("wood_cache_entries", lambda: _cache_stats()["entries"], "gauge",
+                   "Jumlah entri cache di memori")
+registry.collector("wood_cache_bytes", lambda: _cache_stats()["bytes"], "gauge",
+                   "Ukuran cache di memori (byte)")
+registry.collector("wood_worker_pool_size", _pool_size, "gauge",
+                   "Jumlah proses worker (0 = nonaktif)")
+registry.collector("wood_queue_depth", _queue_depth, "gauge",
+                   "Tugas di worker pool yang belum selesai")
+registry.collector("wood_model_load_seconds", _model_load_seconds, "gauge",
+                   "Waktu load model terakhir (detik)")
+registry.collector("wood_model_reloads_total", _model_reloads, "counter",
+                   "Jumlah penukaran model oleh hot reload")
+
+
+def observe_stages(timings):
+    """Masukkan timings (ms, dari StageTimer) ke histogram per tahap."""
+    for stage, ms in (timings or {}).items():
+        if stage != "total":
+            registry.observe("wood_stage_duration_seconds", ms / 1000.0, stage=stage)
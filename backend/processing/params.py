@@ -0,0 +1,203 @@
+"""
+Wood Knots Detection - Pipeline Parameters
+
+PipelineParams adalah satu set parameter pipeline PCD yang immutable dan
+hashable. Semua tahap (Pipeline, preprocess_for_classification, ekstraksi
+fitur, tiled processing, key cache) membaca parameter dari objek ini,
+sehingga fitur saat training dan serving dihitung dengan nilai yang sama.
+
+Override per request dibuat lewat params.replace(...) / from_mapping(...)
+dan divalidasi; nilai tidak valid melempar ValueError. Set parameter yang
+sama selalu menghasilkan objek yang sama (di-intern), sehingga objek
+OpenCV yang sudah dibuat untuk set tersebut (kernel, CLAHE per thread)
+dipakai ulang antar request.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+
+import cv2
+import numpy as np
+
+
+# Batas nilai yang diterima dari override per request
+LIMITS = {
+    "resize_max_dim": (32, 4096),
+    "clahe_clip_limit": (0.1, 40.0),
+    "clahe_tile_grid": (1, 64),
+    "blur_kernel_size": (1, 31),
+    "threshold_value": (0, 255),
+    "morph_kernel_size": (1, 31),
+    "min_contour_area": (0, 1e7),
+    "auto_crop_black_thresh": (0, 255),
+}
+
+# Mode decode gambar (lihat processing.decode_image)
+DECODE_MODES = ("full", "reduced")
+
+_INTERN_MAX = 256
+_interned = OrderedDict()
+_intern_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PipelineParams:
+    """
+    Parameter pipeline PCD (lihat CONFIG untuk nilai default).
+
+    Objek bersifat immutable dan bisa dipakai sebagai key dictionary.
+    Kernel morfologi dan ukuran kernel blur disiapkan saat objek dibuat;
+    CLAHE dibuat sekali per thread (cv2.CLAHE tidak thread-safe).
+    """
+
+    resize_max_dim: int
+    clahe_clip_limit: float
+    clahe_tile_grid: tuple
+    blur_kernel_size: int
+    threshold_value: int
+    morph_kernel_size: int
+    min_contour_area: float
+    auto_crop_black_thresh: int
+    decode_mode: str
+    _compiled: dict = field(default=None, init=False, repr=False, compare=False, hash=False)
+
+    def __post_init__(self):
+        values = _validate({f.name: getattr(self, f.name) for f in _fields()})
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+        kernel = np.ones((self.morph_kernel_size, self.morph_kernel_size), np.uint8)
+        kernel.flags.writeable = False
+        object.__setattr__(self, "_compiled", {
+            "kernel": kernel,
+            "blur_ksize": (self.blur_kernel_size, self.blur_kernel_size),
+            "local": threading.local(),
+        })
+
+    def __reduce__(self):
+        # Objek OpenCV tidak ikut di-pickle (misalnya ke proses worker);
+        # disiapkan ulang di proses tujuan
+        return (make_params, (self.to_dict(),))
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """
+        Buat (atau ambil yang sudah di-intern) PipelineParams dari dictionary.
+
+        Raises:
+            ValueError: Jika ada key yang tidak dikenal atau nilai tidak valid
+        """
+        return make_params(mapping)
+
+    def replace(self, **overrides):
+        """
+        Salinan dengan sebagian parameter diganti.
+
+        Raises:
+            ValueError: Jika ada key yang tidak dikenal atau nilai tidak valid
+        """
+        if not overrides:
+            return self
+        return make_params(dict(self.to_dict(), **overrides))
+
+    def to_dict(self):
+        """Dictionary parameter (bentuk yang sama dengan CONFIG)."""
+        return {f.name: getattr(self, f.name) for f in _fields()}
+
+    @property
+    def kernel(self):
+        """Structuring element morfologi (read-only)."""
+        return self._compiled["kernel"]
+
+    @property
+    def blur_ksize(self):
+        return self._compiled["blur_ksize"]
+
+    def clahe(self):
+        """Objek CLAHE milik thread saat ini untuk set parameter ini."""
+        local = self._compiled["local"]
+        clahe = getattr(local, "clahe", None)
+        if clahe is None:
+            clahe = local.clahe = cv2.createCLAHE(
+                clipLimit=self.clahe_clip_limit, tileGridSize=self.clahe_tile_grid
+            )
+        return clahe
+
+
+def _fields():
+    return [f for f in fields(PipelineParams) if f.init]
+
+
+def _number(name, value, cast):
+    if isinstance(value, bool):
+        raise ValueError(f"{name} harus berupa angka")
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} harus berupa angka")
+    if cast is int and number != float(value):
+        raise ValueError(f"{name} harus berupa bilangan bulat")
+    low, high = LIMITS[name]
+    if not low <= number <= high:
+        raise ValueError(f"{name} harus antara {low} dan {high}")
+    return number
+
+
+def _validate(values):
+    """Normalisasi tipe dan cek batas setiap parameter."""
+    result = {
+        "resize_max_dim": _number("resize_max_dim", values["resize_max_dim"], int),
+        "clahe_clip_limit": _number("clahe_clip_limit", values["clahe_clip_limit"], float),
+        "blur_kernel_size": _number("blur_kernel_size", values["blur_kernel_size"], int),
+        "threshold_value": _number("threshold_value", values["threshold_value"], int),
+        "morph_kernel_size": _number("morph_kernel_size", values["morph_kernel_size"], int),
+        "min_contour_area": _number("min_contour_area", values["min_contour_area"], float),
+        "auto_crop_black_thresh": _number("auto_crop_black_thresh", values["auto_crop_black_thresh"], int),
+    }
+    grid = values["clahe_tile_grid"]
+    if isinstance(grid, (int, str)) and not isinstance(grid, bool):
+        grid = (grid, grid) if isinstance(grid, int) else grid.strip("()[] ").split(",")
+    if not isinstance(grid, (tuple, list)) or len(grid) != 2:
+        raise ValueError("clahe_tile_grid harus berupa dua bilangan bulat, misalnya [8, 8]")
+    result["clahe_tile_grid"] = tuple(_number("clahe_tile_grid", v, int) for v in grid)
+    decode_mode = str(values["decode_mode"]).strip().lower()
+    if decode_mode not in DECODE_MODES:
+        raise ValueError(f"decode_mode harus salah satu dari {', '.join(DECODE_MODES)}")
+    result["decode_mode"] = decode_mode
+    if result["blur_kernel_size"] % 2 == 0:
+        raise ValueError("blur_kernel_size harus ganjil")
+    # min_contour_area tetap int jika nilainya bulat (sama dengan CONFIG)
+    if result["min_contour_area"] == int(result["min_contour_area"]):
+        result["min_contour_area"] = int(result["min_contour_area"])
+    return result
+
+
+def make_params(mapping):
+    """
+    PipelineParams dari dictionary, di-intern berdasarkan nilai parameter.
+
+    Raises:
+        ValueError: Jika ada key yang tidak dikenal, key yang hilang, atau
+            nilai tidak valid
+    """
+    names = [f.name for f in _fields()]
+    unknown = sorted(set(mapping) - set(names))
+    if unknown:
+        raise ValueError(f"Parameter tidak dikenal: {', '.join(unknown)}")
+    missing = [name for name in names if name not in mapping]
+    if missing:
+        raise ValueError(f"Parameter tidak lengkap: {', '.join(missing)}")
+    values = _validate(mapping)
+    key = tuple(values[name] for name in names)
+    with _intern_lock:
+        params = _interned.get(key)
+        if params is not None:
+            _interned.move_to_end(key)
+            return params
+    params = PipelineParams(**values)
+    with _intern_lock:
+        params = _interned.setdefault(key, params)
+        _interned.move_to_end(key)
+        while len(_interned) > _INTERN_MAX:
+            _interned.popitem(last=False)
+    return params
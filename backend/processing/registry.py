@@ -0,0 +1,234 @@
+"""
+Wood Knots Detection - Model Registry
+
+Menyimpan model classifier yang aktif dan menggantinya tanpa restart.
+
+Watcher thread memeriksa file model (MODEL_PATH) secara berkala. Jika file
+berubah (ukuran / mtime), model baru di-load di background lalu ditukar
+secara atomik: request yang sedang berjalan tetap memakai model lama yang
+sudah dipegangnya, request berikutnya memakai model baru. Jika model baru
+gagal di-load, model lama tetap dipakai.
+
+Versi dan metrik model dibaca dari metadata artifact (key "version",
+"metrics", "trained_at", "feature_names" di dictionary .pkl).
+"""
+
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Nama tampilan untuk tipe estimator yang dikenal
+ESTIMATOR_NAMES = {
+    "RandomForestClassifier": "Random Forest",
+    "ExtraTreesClassifier": "Extra Trees",
+    "CompiledForest": "Random Forest",
+}
+
+
+def file_fingerprint(path):
+    """Identitas file model (ukuran + mtime), dipakai sebagai key cache hasil."""
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def model_info(model_data):
+    """
+    Ringkasan model untuk response API.
+
+    Returns:
+        Dictionary name, version, accuracy, metrics, trained_at, features_used.
+        accuracy bernilai None jika artifact tidak menyimpan metrik.
+    """
+    from . import CLASSIFICATION_FEATURES
+
+    metrics = dict(model_data.get('metrics') or {})
+    if 'accuracy' not in metrics and model_data.get('accuracy') is not None:
+        metrics['accuracy'] = model_data['accuracy']
+    estimator = type(model_data['model']).__name__
+    return {
+        "name": model_data.get('name') or ESTIMATOR_NAMES.get(estimator, estimator),
+        "version": model_data.get('version') or model_data['fingerprint'],
+        "accuracy": metrics.get('accuracy'),
+        "metrics": metrics,
+        "trained_at": model_data.get('trained_at'),
+        "features_used": list(model_data.get('feature_names') or CLASSIFICATION_FEATURES),
+    }
+
+
+class ModelRegistry:
+    """
+    Model aktif + hot reload.
+
+    get() mengembalikan dictionary model (hasil load_model_file) yang aktif.
+    Penukaran model hanya berupa assignment referensi, sehingga pembaca
+    tidak perlu lock.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._active = None
+        self._lock = threading.Lock()   # Satu load model dalam satu waktu
+        self._pending = None            # Fingerprint baru yang menunggu stabil
+        self._watcher = None
+        self._stop = threading.Event()
+        self.watch_interval = 0
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+
+    @property
+    def path(self):
+        """Path file model (default processing.MODEL_PATH saat dipanggil)."""
+        if self._path is not None:
+            return self._path
+        from . import MODEL_PATH
+        return MODEL_PATH
+
+    def get(self):
+        """
+        Model aktif; di-load saat pertama kali dipanggil.
+
+        Raises:
+            FileNotFoundError: Jika file model belum ada
+        """
+        model_data = self._active
+        if model_data is None:
+            with self._lock:
+                if self._active is None:
+                    self._swap(self._load())
+                model_data = self._active
+        return model_data
+
+    def peek(self):
+        """Model aktif tanpa memicu load (None jika belum ada)."""
+        return self._active
+
+    def reload(self, force=False):
+        """
+        Load ulang model jika file-nya berubah lalu tukar secara atomik.
+
+        Args:
+            force: Load ulang meskipun fingerprint file sama
+
+        Returns:
+            True jika model ditukar
+
+        Raises:
+            FileNotFoundError: Jika file model tidak ada
+            Exception: Error load model (model lama tetap aktif)
+        """
+        with self._lock:
+            fingerprint = file_fingerprint(self.path)
+            active = self._active
+            if not force and active is not None and active['fingerprint'] == fingerprint:
+                return False
+            try:
+                model_data = self._load()
+            except Exception as e:
+                self.last_error = {"fingerprint": fingerprint, "error": str(e), "time": time.time()}
+                raise
+            self._swap(model_data)
+            if active is not None:
+                self.reloads += 1
+                self._remove_stale_sidecar(active)
+        logger.info("Model %s aktif (%s)", model_info(model_data)['version'], self.path)
+        return True
+
+    def check(self):
+        """
+        Satu kali pemeriksaan watcher.
+
+        File baru baru di-load setelah fingerprint-nya sama pada dua
+        pemeriksaan berturut-turut, supaya file yang masih ditulis tidak
+        ikut di-load.
+
+        Returns:
+            True jika model ditukar
+        """
+        try:
+            fingerprint = file_fingerprint(self.path)
+        except OSError:
+            # File sedang diganti atau belum ada
+            return False
+        active = self._active
+        if active is not None and active['fingerprint'] == fingerprint:
+            self._pending = None
+            return False
+        if self.last_error is not None and self.last_error['fingerprint'] == fingerprint:
+            return False
+        if self._pending != fingerprint:
+            self._pending = fingerprint
+            return False
+        self._pending = None
+        try:
+            return self.reload()
+        except Exception:
+            logger.exception("Gagal load model baru dari %s; model lama tetap dipakai", self.path)
+            return False
+
+    def start_watcher(self, interval):
+        """Mulai thread yang memanggil check() setiap interval detik (0 = tidak ada)."""
+        self.stop_watcher()
+        self.watch_interval = interval
+        if interval <= 0:
+            return
+        self._stop = threading.Event()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(self._stop, interval), name="model-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+        self.watch_interval = 0
+
+    @property
+    def watching(self):
+        return self._watcher is not None
+
+    def info(self):
+        """Status registry dan model aktif untuk API."""
+        status = {
+            "path": self.path,
+            "loaded": self._active is not None,
+            "watching": self.watching,
+            "watch_interval": self.watch_interval,
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+        }
+        if self._active is not None:
+            status["model"] = model_info(self._active)
+            status["fingerprint"] = self._active['fingerprint']
+            status["load_seconds"] = round(self._active['load_seconds'], 4)
+        return status
+
+    def _watch(self, stop, interval):
+        while not stop.wait(interval):
+            self.check()
+
+    def _load(self):
+        from . import load_model_file
+        return load_model_file(self.path)
+
+    def _swap(self, model_data):
+        self._active = model_data
+        self.loaded_at = time.time()
+        self.last_error = None
+
+    def _remove_stale_sidecar(self, old_model):
+        from . import _mmap_model_path
+        try:
+            os.remove(_mmap_model_path(self.path, old_model['fingerprint']))
+        except OSError:
+            pass
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,450 @@
+"""
+Wood Knots Detection - Parameter Sweep
+
+Grid search parameter pipeline di atas satu dataset tanpa mengulang tahap
+yang sama untuk setiap kombinasi.
+
+Prefix decode → resize → gray → CLAHE → blur (preprocess_for_classification)
+dihitung sekali per gambar untuk setiap nilai parameter prefix, dan bisa
+disimpan di disk (--cache-dir) untuk dipakai sweep berikutnya. Dari prefix
+itu hanya tahap hilir yang bercabang: threshold sekali per threshold_value,
+morphology + kontur sekali per (threshold_value, morph_kernel_size), dan
+keempat fitur untuk semua min_contour_area dihitung sekaligus sebagai mask
+NumPy.
+
+Hasilnya tabel akurasi dan latency per kombinasi. Label diambil dari nama
+folder induk gambar ("Cacat" / "Tidak Cacat", sama dengan class_names
+model) atau dari file CSV (--labels, kolom path,label).
+
+Contoh (dari folder backend):
+    python -m processing.sweep dataset/ --threshold 70,80,86,95 --morph 3,4,5 \\
+        --min-area 100,200,300 -o sweep.csv
+    python -m processing.sweep dataset/ --grid blur_kernel_size=3,5,7 --cv 5 \\
+        --cache-dir .sweep_cache
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from . import (
+    DEFAULT_PARAMS,
+    ContourStats,
+    apply_morphology,
+    apply_threshold,
+    find_contours,
+    preprocess_for_classification,
+)
+from .batch import iter_images
+from .cache import config_digest, file_digest
+
+
+# Parameter yang menentukan hasil prefix (sampai Gaussian blur)
+PREFIX_FIELDS = ("decode_mode", "resize_max_dim", "clahe_clip_limit", "clahe_tile_grid", "blur_kernel_size")
+DEFAULT_CLASS_NAMES = ["Tidak Cacat", "Cacat"]
+
+
+def expand_grid(grid, base=None):
+    """
+    Semua kombinasi parameter dari grid.
+
+    Args:
+        grid: Dictionary nama parameter -> list nilai
+        base: PipelineParams untuk parameter yang tidak di-sweep
+            (default DEFAULT_PARAMS)
+
+    Returns:
+        List PipelineParams (sudah divalidasi)
+
+    Raises:
+        ValueError: Jika ada nama atau nilai parameter yang tidak valid
+    """
+    base = base or DEFAULT_PARAMS
+    names = sorted(grid)
+    return [
+        base.replace(**dict(zip(names, values)))
+        for values in product(*(grid[name] for name in names))
+    ]
+
+
+def features_for_areas(stats, min_areas):
+    """
+    Empat fitur klasifikasi untuk banyak min_contour_area sekaligus.
+
+    Sama dengan stats.classification_features(min_area) untuk setiap
+    nilai, tetapi dihitung sebagai satu mask (len(min_areas) x jumlah
+    kontur).
+
+    Returns:
+        Array (len(min_areas), 4)
+    """
+    min_areas = np.asarray(min_areas, dtype=np.float64)
+    result = np.zeros((len(min_areas), 4))
+    if len(stats) == 0:
+        return result
+    mask = stats.area[None, :] > min_areas[:, None]
+    counts = mask.sum(axis=1)
+    circ_mask = mask & (stats.perimeter > 0)[None, :]
+    circ_counts = circ_mask.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[:, 0] = counts
+        result[:, 1] = mask @ stats.area
+        result[:, 2] = np.where(circ_counts > 0, (circ_mask @ stats.circularity()) / circ_counts, 0)
+        result[:, 3] = np.where(counts > 0, (mask @ stats.aspect_ratio()) / counts, 0)
+    result[counts == 0] = 0
+    return result
+
+
+class PrefixCache:
+    """
+    Hasil prefix (gambar setelah blur) di disk, satu file .npy per
+    (isi gambar, parameter prefix). File dibaca dengan memory map.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, image_path, params):
+        prefix = {name: getattr(params, name) for name in PREFIX_FIELDS}
+        return os.path.join(self.directory, f"{file_digest(image_path)}_{config_digest(prefix)}.npy")
+
+    def get(self, image_path, params):
+        try:
+            return np.load(self._path(image_path, params), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def put(self, image_path, params, img_blur):
+        path = self._path(image_path, params)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, img_blur)
+        os.replace(tmp_path, path)
+
+
+def plan_combinations(combos):
+    """
+    Kelompokkan kombinasi per prefix → threshold → kernel morfologi.
+
+    Returns:
+        Dictionary {prefix_params: {threshold: {morph_kernel_size:
+        (params, [index kombinasi], [min_contour_area])}}}
+    """
+    plan = {}
+    for index, params in enumerate(combos):
+        prefix = DEFAULT_PARAMS.replace(**{name: getattr(params, name) for name in PREFIX_FIELDS})
+        by_morph = plan.setdefault(prefix, {}).setdefault(params.threshold_value, {})
+        _, indices, areas = by_morph.setdefault(params.morph_kernel_size, (params, [], []))
+        indices.append(index)
+        areas.append(params.min_contour_area)
+    return plan
+
+
+def sweep_image(image_path, plan, n_combos, prefix_cache=None):
+    """
+    Fitur semua kombinasi untuk satu gambar.
+
+    Returns:
+        Tuple (features (n_combos, 4), prefix_ms, downstream_ms (n_combos,))
+        downstream_ms adalah perkiraan waktu tahap hilir satu kombinasi jika
+        dijalankan sendiri (threshold + morph/kontur + fitur)
+    """
+    features = np.zeros((n_combos, 4))
+    downstream_ms = np.zeros(n_combos)
+    prefix_ms = 0.0
+    for prefix_params, thresholds in plan.items():
+        start = time.perf_counter()
+        img_blur = prefix_cache.get(image_path, prefix_params) if prefix_cache else None
+        if img_blur is None:
+            img_blur = preprocess_for_classification(image_path, prefix_params)
+            if prefix_cache is not None:
+                prefix_cache.put(image_path, prefix_params, img_blur)
+        prefix_ms += (time.perf_counter() - start) * 1000
+
+        for threshold, by_morph in thresholds.items():
+            start = time.perf_counter()
+            binary = apply_threshold(img_blur, thresh_value=threshold)
+            threshold_ms = (time.perf_counter() - start) * 1000
+            for params, indices, areas in by_morph.values():
+                start = time.perf_counter()
+                stats = ContourStats(find_contours(apply_morphology(binary, params=params)))
+                middle = time.perf_counter()
+                features[indices] = features_for_areas(stats, areas)
+                end = time.perf_counter()
+                downstream_ms[indices] = (
+                    threshold_ms + (middle - start) * 1000 + (end - middle) * 1000 / len(indices)
+                )
+    return features, prefix_ms, downstream_ms
+
+
+def labels_from_csv(path, class_names):
+    """Baca label dari CSV (kolom path,label; label berupa index atau nama kelas)."""
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            label = row['label'].strip()
+            labels[os.path.normpath(row['path'])] = (
+                int(label) if label.isdigit() else class_names.index(label)
+            )
+    return labels
+
+
+def label_from_folder(image_path, class_names):
+    """Label dari nama folder induk (None jika tidak cocok dengan kelas mana pun)."""
+    folder = os.path.basename(os.path.dirname(image_path)).strip().lower()
+    for index, name in enumerate(class_names):
+        if folder == name.lower():
+            return index
+    return None
+
+
+def score(X, y, model_data=None, cv=None):
+    """
+    Akurasi fitur X terhadap label y.
+
+    Args:
+        model_data: Model aktif untuk memprediksi X
+        cv: Jika diisi, akurasi rata-rata k-fold Random Forest yang dilatih
+            ulang dari X (untuk parameter yang berbeda dari data training)
+
+    Returns:
+        Akurasi (0..1) atau None jika tidak bisa dihitung
+    """
+    if len(y) == 0:
+        return None
+    if cv:
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import cross_val_score
+        if min(np.bincount(y)) < cv or len(np.unique(y)) < 2:
+            return None
+        model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+        return float(np.mean(cross_val_score(model, X, y, cv=cv)))
+    if model_data is None:
+        return None
+    model = model_data.get('compiled') or model_data['model']
+    return float(np.mean(model.predict(X) == y))
+
+
+def run_sweep(image_paths, grid, base=None, labels=None, model_data=None, cv=None,
+              threads=None, prefetch=32, cache_dir=None, progress=False):
+    """
+    Jalankan sweep parameter pada sekumpulan gambar.
+
+    Args:
+        image_paths: Iterable path gambar
+        grid: Dictionary nama parameter -> list nilai
+        base: PipelineParams dasar (default DEFAULT_PARAMS)
+        labels: Dictionary path -> label (index kelas), opsional
+        model_data: Model untuk akurasi (tanpa cv)
+        cv: Jumlah fold untuk akurasi cross-validation
+        threads: Jumlah thread (default jumlah core)
+        prefetch: Maksimal gambar in-flight
+        cache_dir: Folder cache prefix di disk (opsional)
+        progress: Tampilkan progres ke stderr
+
+    Returns:
+        Dictionary ringkasan dan "results": list baris per kombinasi,
+        diurutkan dari akurasi tertinggi lalu latency terendah
+    """
+    combos = expand_grid(grid, base)
+    plan = plan_combinations(combos)
+    prefix_cache = PrefixCache(cache_dir) if cache_dir else None
+    labels = labels or {}
+
+    rows = []
+    row_labels = []
+    prefix_total = 0.0
+    downstream_total = np.zeros(len(combos))
+    stats = {"images": 0, "errors": 0}
+    started = time.perf_counter()
+
+    def collect(image_path, future):
+        nonlocal prefix_total
+        try:
+            features, prefix_ms, downstream_ms = future.result()
+        except Exception as e:
+            stats["errors"] += 1
+            if progress:
+                print(f"{image_path}: {e}", file=sys.stderr)
+            return
+        rows.append(features)
+        row_labels.append(labels.get(os.path.normpath(image_path)))
+        prefix_total += prefix_ms
+        downstream_total[:] += downstream_ms
+        stats["images"] += 1
+        if progress and stats["images"] % 100 == 0:
+            rate = stats["images"] / (time.perf_counter() - started)
+            print(f"{stats['images']} gambar ({rate:.1f}/s)", file=sys.stderr)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        in_flight = deque()
+        for image_path in image_paths:
+            in_flight.append((
+                image_path, pool.submit(sweep_image, image_path, plan, len(combos), prefix_cache)
+            ))
+            if len(in_flight) >= prefetch:
+                collect(*in_flight.popleft())
+        while in_flight:
+            collect(*in_flight.popleft())
+
+    n = stats["images"]
+    # (gambar, kombinasi, 4) -> satu matriks fitur per kombinasi
+    features = np.stack(rows, axis=1) if rows else np.zeros((len(combos), 0, 4))
+    labelled = np.array([label is not None for label in row_labels], dtype=bool)
+    y = np.array([label for label in row_labels if label is not None], dtype=np.intp)
+    prefix_ms = prefix_total / n if n else 0.0
+
+    swept = sorted(grid)
+    results = []
+    for index, params in enumerate(combos):
+        X = features[index]
+        downstream_ms = downstream_total[index] / n if n else 0.0
+        accuracy = score(X[labelled], y, model_data, cv)
+        results.append({
+            **{name: getattr(params, name) for name in swept},
+            "accuracy": None if accuracy is None else round(accuracy, 4),
+            "avg_knots": round(float(X[:, 0].mean()), 3) if n else None,
+            "downstream_ms": round(downstream_ms, 3),
+            "latency_ms": round(prefix_ms + downstream_ms, 3),
+        })
+    results.sort(key=lambda r: (r["accuracy"] is None, -(r["accuracy"] or 0), r["latency_ms"]))
+
+    seconds = time.perf_counter() - started
+    return {
+        **stats,
+        "labelled": int(labelled.sum()),
+        "combinations": len(combos),
+        "prefix_ms": round(prefix_ms, 3),
+        "seconds": round(seconds, 3),
+        "results": results,
+    }
+
+
+def format_table(results):
+    """Tabel teks rata kiri dari list baris hasil sweep."""
+    if not results:
+        return ""
+    columns = list(results[0])
+    cells = [[("-" if row[c] is None else str(row[c])) for c in columns] for row in results]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in cells)
+    return "\n".join(lines)
+
+
+def write_results(path, results):
+    """Tulis hasil sweep ke .csv atau .json (dari ekstensi)."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            writer = csv.DictWriter(f, fieldnames=list(results[0]) if results else [])
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            json.dump(results, f, indent=2, default=list)
+
+
+def _values(text):
+    return [value.strip() for value in text.split(',') if value.strip()]
+
+
+def parse_grid(args):
+    """Gabungkan opsi --threshold/--morph/--min-area/--grid menjadi grid."""
+    grid = {}
+    if args.threshold:
+        grid["threshold_value"] = _values(args.threshold)
+    if args.morph:
+        grid["morph_kernel_size"] = _values(args.morph)
+    if args.min_area:
+        grid["min_contour_area"] = _values(args.min_area)
+    for item in args.grid or []:
+        name, _, values = item.partition('=')
+        if not values:
+            raise ValueError(f"--grid harus berbentuk NAMA=nilai1,nilai2: {item}")
+        # clahe_tile_grid memakai format 8x8 agar tidak bentrok dengan koma
+        grid[name.strip()] = [
+            tuple(v.split('x')) if name.strip() == "clahe_tile_grid" else v for v in _values(values)
+        ]
+    return grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep parameter pipeline di atas dataset (akurasi dan latency per kombinasi)."
+    )
+    parser.add_argument("root", help="Folder dataset atau file gambar")
+    parser.add_argument("--threshold", help="Nilai threshold_value, misalnya 70,80,86")
+    parser.add_argument("--morph", help="Nilai morph_kernel_size, misalnya 3,4,5")
+    parser.add_argument("--min-area", help="Nilai min_contour_area, misalnya 100,200")
+    parser.add_argument("--grid", action="append", metavar="NAMA=V1,V2",
+                        help="Parameter lain (boleh berulang), misalnya blur_kernel_size=3,5 "
+                             "atau clahe_tile_grid=4x4,8x8")
+    parser.add_argument("--labels", help="CSV label (kolom path,label); default dari nama folder")
+    parser.add_argument("--cv", type=int, help="Akurasi k-fold RF dilatih ulang per kombinasi")
+    parser.add_argument("--model", help="Path model .pkl (default processing/wood_classifier_rf.pkl)")
+    parser.add_argument("--cache-dir", help="Folder cache prefix (dipakai ulang antar sweep)")
+    parser.add_argument("--threads", type=int, help="Jumlah thread (default jumlah core)")
+    parser.add_argument("--prefetch", type=int, default=32, help="Maksimal gambar in-flight")
+    parser.add_argument("-o", "--output", help="Simpan hasil ke .csv atau .json")
+    parser.add_argument("--quiet", action="store_true", help="Tanpa progres di stderr")
+    args = parser.parse_args(argv)
+
+    import processing
+    if args.model:
+        processing.MODEL_PATH = args.model
+
+    grid = parse_grid(args)
+    if not grid:
+        parser.error("Tidak ada parameter yang di-sweep (--threshold/--morph/--min-area/--grid)")
+    try:
+        expand_grid(grid)
+    except ValueError as e:
+        parser.error(str(e))
+
+    model_data = None
+    if not args.cv:
+        try:
+            model_data = processing.load_classifier()
+        except FileNotFoundError:
+            print("Model tidak ditemukan; akurasi tidak dihitung (pakai --cv)", file=sys.stderr)
+    class_names = list(model_data['class_names']) if model_data else DEFAULT_CLASS_NAMES
+
+    image_paths = list(iter_images(args.root))
+    if args.labels:
+        labels = labels_from_csv(args.labels, class_names)
+    else:
+        labels = {}
+        for image_path in image_paths:
+            label = label_from_folder(image_path, class_names)
+            if label is not None:
+                labels[os.path.normpath(image_path)] = label
+
+    summary = run_sweep(
+        image_paths, grid,
+        labels=labels,
+        model_data=model_data,
+        cv=args.cv,
+        threads=args.threads,
+        prefetch=args.prefetch,
+        cache_dir=args.cache_dir,
+        progress=not args.quiet,
+    )
+    results = summary.pop("results")
+    print(format_table(results))
+    print(json.dumps(summary), file=sys.stderr)
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
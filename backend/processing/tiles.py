@@ -0,0 +1,436 @@
+"""
+Wood Knots Detection - Tiled Processing
+
+Deteksi mata kayu pada scan papan resolusi tinggi tanpa resize ke 512 px.
+
+Gambar dibagi menjadi tile (core) berukuran tile_size yang diproses dengan
+halo (overlap) di sekelilingnya, sehingga CLAHE, blur dan morfologi di tepi
+tile melihat piksel tetangganya. Kontur dicari hanya di area core; kontur
+yang menyentuh batas antar-tile adalah potongan dari mata kayu yang sama
+dan digabung kembali sebelum fitur dihitung.
+
+Tile diproses paralel di thread pool (OpenCV melepas GIL) dengan jumlah
+tile in-flight yang dibatasi. File BMP tanpa kompresi dibaca langsung dari
+disk lewat memory map per tile; format lain (JPEG/PNG) di-decode sekali
+sebagai grayscale (1 byte per piksel).
+
+Contoh:
+    result = inspect_tiled(image_path, tile_size=1024, overlap=64)
+"""
+
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import (
+    DEFAULT_PARAMS,
+    REDUCED_GRAYSCALE_FLAGS,
+    ContourStats,
+    apply_clahe,
+    apply_gaussian_blur,
+    apply_morphology,
+    apply_threshold,
+    classify_features,
+    detections_from_features,
+    load_classifier,
+)
+from .metrics import StageTimer
+
+
+TILE_SIZE = int(os.environ.get("WOOD_TILE_SIZE", "1024"))
+TILE_OVERLAP = int(os.environ.get("WOOD_TILE_OVERLAP", "64"))
+# Ukuran sel spatial hash untuk mencari potongan kontur yang bersentuhan
+_MERGE_CELL = 256
+
+
+# =============================================================================
+# SUMBER TILE
+# Setiap sumber menyediakan width, height dan read(x0, y0, x1, y1) yang
+# mengembalikan potongan grayscale (uint8) dari area tersebut.
+# =============================================================================
+
+class ArraySource:
+    """Tile dari gambar yang sudah ada di memori (grayscale atau BGR)."""
+
+    kind = "decoded"
+
+    def __init__(self, img):
+        self.img = img
+        self.height, self.width = img.shape[:2]
+
+    def read(self, x0, y0, x1, y1):
+        region = self.img[y0:y1, x0:x1]
+        if region.ndim == 2:
+            return region
+        return cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+
+
+class BmpSource:
+    """
+    Tile dari file BMP tanpa kompresi (8/24/32 bit) lewat memory map.
+
+    Hanya baris dan kolom tile yang dibaca dari disk; gambar tidak pernah
+    di-decode utuh.
+
+    Raises:
+        ValueError: Jika file bukan BMP yang didukung
+    """
+
+    kind = "bmp-mmap"
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(54)
+            if len(header) < 54 or header[:2] != b'BM':
+                raise ValueError("Bukan file BMP")
+            offset, dib_size = struct.unpack_from('<II', header, 10)
+            width, height, _, bpp, compression = struct.unpack_from('<iiHHI', header, 18)
+            colors_used = struct.unpack_from('<I', header, 46)[0]
+            if compression != 0 or bpp not in (8, 24, 32) or width <= 0 or height == 0:
+                raise ValueError(f"BMP tidak didukung (bpp={bpp}, compression={compression})")
+            self.lut = None
+            if bpp == 8:
+                f.seek(14 + dib_size)
+                palette = np.frombuffer(f.read(4 * (colors_used or 256)), np.uint8).reshape(1, -1, 4)
+                self.lut = cv2.cvtColor(palette[:, :, :3], cv2.COLOR_BGR2GRAY).ravel()
+                # Index di luar palette dianggap hitam
+                self.lut = np.concatenate([self.lut, np.zeros(256 - len(self.lut), np.uint8)])
+
+        self.width = width
+        self.height = abs(height)
+        self.bottom_up = height > 0
+        self.channels = bpp // 8
+        stride = ((bpp * width + 31) // 32) * 4
+        self.data = np.memmap(path, np.uint8, 'r', offset=offset, shape=(self.height, stride))
+
+    def read(self, x0, y0, x1, y1):
+        if self.bottom_up:
+            rows = self.data[self.height - y1:self.height - y0][::-1]
+        else:
+            rows = self.data[y0:y1]
+        c = self.channels
+        pixels = np.ascontiguousarray(rows[:, x0 * c:x1 * c])
+        if c == 1:
+            return self.lut[pixels]
+        pixels = pixels.reshape(y1 - y0, x1 - x0, c)
+        code = cv2.COLOR_BGR2GRAY if c == 3 else cv2.COLOR_BGRA2GRAY
+        return cv2.cvtColor(pixels, code)
+
+
+def open_source(image_path, scale=1.0):
+    """
+    Pilih sumber tile untuk gambar.
+
+    Args:
+        image_path: Path file gambar
+        scale: Faktor resolusi kerja terhadap resolusi asli (1.0 = native)
+
+    Returns:
+        BmpSource jika file BMP bisa di-memmap dan scale 1.0, jika tidak
+        ArraySource dari hasil decode grayscale (di-resize jika scale < 1)
+
+    Raises:
+        ValueError: Jika gambar gagal dibaca
+    """
+    if scale == 1.0 and image_path.lower().endswith('.bmp'):
+        try:
+            return BmpSource(image_path)
+        except ValueError:
+            pass
+
+    # Selalu dari file (bukan hasil decode upload BGR), supaya fitur tidak
+    # bergantung pada isi cache; decode langsung dalam resolusi rendah jika
+    # cukup untuk scale
+    factor, flag = 1, cv2.IMREAD_GRAYSCALE
+    for candidate, reduced in REDUCED_GRAYSCALE_FLAGS:
+        if scale * candidate <= 1.0:
+            factor, flag = candidate, reduced
+            break
+    img = cv2.imread(image_path, flag)
+    if img is None:
+        raise ValueError(f"Gagal membaca gambar: {image_path}")
+    # Sisa skala setelah decoder memperkecil gambar
+    scale = scale * factor
+
+    if scale != 1.0:
+        h, w = img.shape[:2]
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    return ArraySource(img)
+
+
+# =============================================================================
+# PEMROSESAN TILE
+# =============================================================================
+
+def tile_grid(width, height, tile_size):
+    """Daftar area core (x0, y0, x1, y1) yang menutupi gambar tanpa overlap."""
+    return [
+        (x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+        for y0 in range(0, height, tile_size)
+        for x0 in range(0, width, tile_size)
+    ]
+
+
+def process_tile(source, core, overlap, params, min_area):
+    """
+    Jalankan CLAHE → blur → threshold → morphology pada satu tile + halo.
+
+    Args:
+        source: Sumber tile (ArraySource / BmpSource)
+        core: Area core (x0, y0, x1, y1) dalam koordinat gambar
+        overlap: Lebar halo (px) di setiap sisi
+        params: PipelineParams
+        min_area: Area minimum mata kayu di resolusi kerja
+
+    Returns:
+        (knots, fragments): kontur mata kayu yang utuh di dalam core, dan
+        kontur yang menyentuh batas dengan tile tetangga (belum difilter
+        area karena bisa jadi bagian dari mata kayu yang lebih besar).
+        Koordinat kontur sudah dalam koordinat gambar.
+    """
+    cx0, cy0, cx1, cy1 = core
+    px0 = max(0, cx0 - overlap)
+    py0 = max(0, cy0 - overlap)
+    px1 = min(source.width, cx1 + overlap)
+    py1 = min(source.height, cy1 + overlap)
+
+    gray = source.read(px0, py0, px1, py1)
+    # Grid CLAHE dihitung agar ukuran sel (px) sama dengan CLAHE pada
+    # gambar utuh, sehingga kontras lokal tidak bergantung pada tile_size
+    grid_x, grid_y = params.clahe_tile_grid
+    tile_grid_size = (
+        max(1, round((px1 - px0) * grid_x / source.width)),
+        max(1, round((py1 - py0) * grid_y / source.height)),
+    )
+    img = apply_clahe(gray, tile_grid_size=tile_grid_size, params=params)
+    img = apply_gaussian_blur(img, dst=img, params=params)
+    img = apply_threshold(img, dst=img, params=params)
+    morph = apply_morphology(img, params=params)
+
+    core_mask = np.ascontiguousarray(morph[cy0 - py0:cy1 - py0, cx0 - px0:cx1 - px0])
+    contours, _ = cv2.findContours(
+        core_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(cx0, cy0)
+    )
+    if not contours:
+        return [], []
+
+    stats = ContourStats(contours)
+    touches = np.zeros(len(contours), bool)
+    if cx0 > 0:
+        touches |= stats.x == cx0
+    if cy0 > 0:
+        touches |= stats.y == cy0
+    if cx1 < source.width:
+        touches |= stats.x + stats.width == cx1
+    if cy1 < source.height:
+        touches |= stats.y + stats.height == cy1
+
+    knots = [contours[i] for i in np.flatnonzero(~touches & stats.knot_mask(min_area))]
+    fragments = [contours[i] for i in np.flatnonzero(touches)]
+    return knots, fragments
+
+
+def merge_fragments(fragments):
+    """
+    Gabungkan potongan kontur di batas tile menjadi kontur utuh.
+
+    Potongan yang bounding box-nya bersentuhan (termasuk diagonal, sesuai
+    konektivitas-8 findContours) dikelompokkan dengan union-find, lalu
+    setiap kelompok digambar ulang ke kanvas kecil dan konturnya dicari
+    kembali.
+
+    Returns:
+        List kontur hasil gabungan (koordinat gambar)
+    """
+    n = len(fragments)
+    if n == 0:
+        return []
+    stats = ContourStats(fragments)
+    x0, y0 = stats.x, stats.y
+    x1 = x0 + stats.width   # eksklusif
+    y1 = y0 + stats.height
+
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    cells = {}
+    for i in range(n):
+        for cy in range((y0[i] - 1) // _MERGE_CELL, y1[i] // _MERGE_CELL + 1):
+            for cx in range((x0[i] - 1) // _MERGE_CELL, x1[i] // _MERGE_CELL + 1):
+                cells.setdefault((cx, cy), []).append(i)
+    for members in cells.values():
+        for a_pos, a in enumerate(members):
+            for b in members[a_pos + 1:]:
+                if (x0[a] <= x1[b] and x0[b] <= x1[a]
+                        and y0[a] <= y1[b] and y0[b] <= y1[a]):
+                    ra, rb = find(a), find(b)
+                    if ra != rb:
+                        parent[rb] = ra
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+
+    merged = []
+    for members in groups.values():
+        if len(members) == 1:
+            merged.append(fragments[members[0]])
+            continue
+        gx0 = int(x0[members].min())
+        gy0 = int(y0[members].min())
+        gx1 = int(x1[members].max())
+        gy1 = int(y1[members].max())
+        canvas = np.zeros((gy1 - gy0 + 2, gx1 - gx0 + 2), np.uint8)
+        cv2.drawContours(
+            canvas, [fragments[i] for i in members], -1, 255,
+            thickness=cv2.FILLED, offset=(1 - gx0, 1 - gy0)
+        )
+        contours, _ = cv2.findContours(
+            canvas, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(gx0 - 1, gy0 - 1)
+        )
+        merged.extend(contours)
+    return merged
+
+
+def run_tiled(source, tile_size=None, overlap=None, params=None, threads=None, timer=None):
+    """
+    Deteksi mata kayu di seluruh gambar secara per tile.
+
+    Args:
+        source: Sumber tile (lihat open_source)
+        tile_size: Ukuran sisi tile core (px, default TILE_SIZE)
+        overlap: Lebar halo tile (px, default TILE_OVERLAP)
+        params: PipelineParams (default DEFAULT_PARAMS)
+        threads: Jumlah thread (default jumlah core)
+        timer: StageTimer opsional
+
+    Returns:
+        Dictionary dengan stats (ContourStats semua mata kayu), min_area
+        (di resolusi kerja), classification_features (4 fitur, dinormalisasi
+        ke resolusi resize_max_dim yang dipakai saat training) dan tiles
+    """
+    params = params or DEFAULT_PARAMS
+    tile_size = tile_size or TILE_SIZE
+    overlap = TILE_OVERLAP if overlap is None else overlap
+    threads = threads or os.cpu_count() or 1
+    timer = timer or StageTimer()
+
+    # Area dan min_contour_area dikalibrasi untuk gambar resize_max_dim;
+    # skala kuadrat mengubahnya ke resolusi kerja dan sebaliknya
+    area_scale = (params.resize_max_dim / max(source.width, source.height)) ** 2
+    min_area = params.min_contour_area / area_scale
+
+    cores = tile_grid(source.width, source.height, tile_size)
+    knots = []
+    fragments = []
+
+    def collect(future):
+        tile_knots, tile_fragments = future.result()
+        knots.extend(tile_knots)
+        fragments.extend(tile_fragments)
+
+    with timer.stage("tiles"):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            in_flight = deque()
+            for core in cores:
+                in_flight.append(pool.submit(process_tile, source, core, overlap, params, min_area))
+                if len(in_flight) >= threads * 2:
+                    collect(in_flight.popleft())
+            while in_flight:
+                collect(in_flight.popleft())
+
+    with timer.stage("merge"):
+        merged = merge_fragments(fragments)
+        merged_stats = ContourStats(merged)
+        knots.extend(merged[i] for i in np.flatnonzero(merged_stats.knot_mask(min_area)))
+
+    with timer.stage("features"):
+        stats = ContourStats(knots)
+        features = stats.classification_features(min_area)
+        if features[0]:
+            features[1] = features[1] * area_scale
+
+    return {
+        "stats": stats,
+        "min_area": min_area,
+        "classification_features": features,
+        "tiles": len(cores),
+        "fragments": len(fragments),
+    }
+
+
+def _inspect_tiled_uncached(image_path, tile_size, overlap, scale, threads, params, model_data):
+    timer = StageTimer()
+    with timer.stage("decode"):
+        source = open_source(image_path, scale)
+    tiled = run_tiled(
+        source, tile_size=tile_size, overlap=overlap, params=params, threads=threads, timer=timer
+    )
+    with timer.stage("inference"):
+        classification = classify_features(tiled["classification_features"], model_data)
+    with timer.stage("detections"):
+        stats = tiled["stats"]
+        features = stats.features(stats.knot_indices(tiled["min_area"]))
+        classification["detections"] = detections_from_features(features)
+        classification["image_dimensions"] = {"width": source.width, "height": source.height}
+        classification["tiling"] = {
+            "tile_size": tile_size,
+            "overlap": overlap,
+            "scale": scale,
+            "tiles": tiled["tiles"],
+            "merged_fragments": tiled["fragments"],
+            "source": source.kind,
+        }
+    classification["timings"] = timer.timings
+    return classification
+
+
+def inspect_tiled(image_path, tile_size=None, overlap=None, scale=1.0, threads=None,
+                  params=None, timer=None):
+    """
+    Klasifikasi + deteksi untuk scan resolusi tinggi dengan pemrosesan per tile.
+
+    Args:
+        image_path: Path ke file gambar
+        tile_size: Ukuran sisi tile (px, default TILE_SIZE)
+        overlap: Lebar halo tile (px, default TILE_OVERLAP)
+        scale: Resolusi kerja relatif terhadap gambar asli (1.0 = native)
+        threads: Jumlah thread tile (default jumlah core)
+        params: PipelineParams (default DEFAULT_PARAMS)
+        timer: StageTimer opsional
+
+    Returns:
+        Dictionary seperti inspect_image; bbox detections dalam koordinat
+        resolusi kerja (image_dimensions), ditambah blok "tiling"
+    """
+    from . import _classify_cache_key
+    from .cache import result_cache
+
+    tile_size = tile_size or TILE_SIZE
+    overlap = TILE_OVERLAP if overlap is None else overlap
+    params = params or DEFAULT_PARAMS
+    timer = timer or StageTimer()
+    model_data = load_classifier()
+
+    with timer.stage("cache_lookup"):
+        options = dict(params.to_dict(), tile_size=tile_size, overlap=overlap, scale=scale)
+        key = _classify_cache_key(image_path, model_data['fingerprint'], options, namespace="inspect_tiled")
+        cached = result_cache.get(key) if key is not None else None
+    if cached is not None:
+        return cached
+
+    result = _inspect_tiled_uncached(image_path, tile_size, overlap, scale, threads, params, model_data)
+    timer.merge(result.pop("timings"))
+    if key is not None:
+        result_cache.put(key, result)
+    return result
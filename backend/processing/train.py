@@ -0,0 +1,267 @@
+"""
+Wood Knots Detection - Training
+
+Melatih ulang model Random Forest dari folder dataset tanpa notebook.
+
+Fitur diekstraksi dengan kode yang sama dengan serving
+(try_extract_classification_features, parameter DEFAULT_PARAMS) secara
+paralel di worker pool. Jika feature store aktif, gambar yang fiturnya
+sudah tersimpan tidak di-decode ulang, dan fitur baru ikut disimpan.
+
+Hasilnya artifact .pkl berisi model, class_names dan metadata (version,
+trained_at, metrics, feature_names, params, training) yang dibaca oleh
+model registry. File ditulis secara atomik, sehingga server yang memantau
+MODEL_PATH langsung memakai model baru (hot reload).
+
+Label diambil dari nama folder induk gambar ("Cacat" / "Tidak Cacat")
+atau dari file CSV (--labels, kolom path,label).
+
+Contoh (dari folder backend):
+    python -m processing.train dataset/ --processes 8 --n-jobs 8
+    python -m processing.train dataset/ -o model_baru.pkl --n-estimators 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .sweep import DEFAULT_CLASS_NAMES, label_from_folder, labels_from_csv
+
+
+def collect_dataset(root, class_names=None, labels_csv=None):
+    """
+    Daftar gambar berlabel di bawah root.
+
+    Returns:
+        Tuple (paths, labels); gambar tanpa label dilewati
+    """
+    from .batch import iter_images
+
+    class_names = class_names or DEFAULT_CLASS_NAMES
+    csv_labels = labels_from_csv(labels_csv, class_names) if labels_csv else None
+    paths, labels = [], []
+    for image_path in iter_images(root):
+        if csv_labels is not None:
+            label = csv_labels.get(os.path.normpath(image_path))
+        else:
+            label = label_from_folder(image_path, class_names)
+        if label is not None:
+            paths.append(image_path)
+            labels.append(label)
+    return paths, np.array(labels, dtype=np.intp)
+
+
+def extract_dataset(image_paths, processes=None, store=None):
+    """
+    Fitur klasifikasi untuk setiap gambar (paralel, kode yang sama dengan serving).
+
+    Args:
+        image_paths: List path gambar
+        processes: Jumlah proses worker (default jumlah core)
+        store: FeatureStore opsional; fitur yang sudah ada dipakai ulang,
+            fitur baru disimpan
+
+    Returns:
+        Tuple (features (N, 4) dengan NaN untuk gambar gagal, errors
+        {path: pesan}, jumlah gambar yang diambil dari store)
+    """
+    from . import workers
+    from .cache import file_digest
+
+    features = np.full((len(image_paths), 4), np.nan)
+    digests = None
+    if store is not None and store.enabled:
+        digests = [file_digest(p) for p in image_paths]
+        features[:] = store.lookup(digests)
+    missing = np.flatnonzero(np.isnan(features).any(axis=1))
+    from_store = len(image_paths) - len(missing)
+
+    previous_size = workers.pool_size()
+    workers.configure_pool(processes or os.cpu_count() or 1)
+    try:
+        extracted = workers.extract_features_many([image_paths[i] for i in missing])
+    finally:
+        workers.configure_pool(previous_size)
+
+    errors = {}
+    new_index, new_rows = [], []
+    for i, (row, error) in zip(missing, extracted):
+        if error is not None:
+            errors[image_paths[i]] = error
+        else:
+            features[i] = row
+            new_index.append(i)
+            new_rows.append(row)
+    if digests is not None and new_rows:
+        store.append([digests[i] for i in new_index], new_rows)
+    return features, errors, from_store
+
+
+def train_model(X, y, n_estimators=100, n_jobs=-1, test_size=0.2, random_state=42):
+    """
+    Latih Random Forest dan hitung metrik pada data uji (stratified split).
+
+    Returns:
+        Tuple (model, metrics, fit_seconds)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, confusion_matrix, precision_recall_fscore_support
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y
+    )
+    model = RandomForestClassifier(n_estimators=n_estimators, n_jobs=n_jobs, random_state=random_state)
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    predictions = model.predict(X_test)
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_test, predictions, average='macro', zero_division=0
+    )
+    metrics = {
+        "accuracy": round(float(accuracy_score(y_test, predictions)), 4),
+        "precision": round(float(precision), 4),
+        "recall": round(float(recall), 4),
+        "f1": round(float(f1), 4),
+        "confusion_matrix": confusion_matrix(y_test, predictions, labels=np.unique(y)).tolist(),
+        "train_size": len(y_train),
+        "test_size": len(y_test),
+    }
+    return model, metrics, fit_seconds
+
+
+def save_model(model_data, path):
+    """Tulis artifact model secara atomik (file sementara lalu os.replace)."""
+    import joblib
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        joblib.dump(model_data, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def run_training(root, output=None, labels_csv=None, processes=None, n_jobs=-1,
+                 n_estimators=100, test_size=0.2, random_state=42, store=None):
+    """
+    Ekstraksi fitur dataset, latih model, dan simpan artifact.
+
+    Args:
+        root: Folder dataset
+        output: Path artifact (default MODEL_PATH)
+        labels_csv: CSV label opsional (kolom path,label)
+        processes: Jumlah proses ekstraksi fitur (default jumlah core)
+        n_jobs: Jumlah thread Random Forest (-1 = semua core)
+        n_estimators: Jumlah pohon
+        test_size: Porsi data uji
+        random_state: Seed split dan model
+        store: FeatureStore opsional (lihat extract_dataset)
+
+    Returns:
+        Dictionary ringkasan (version, output, metrics, training)
+
+    Raises:
+        ValueError: Jika dataset kosong atau hanya berisi satu kelas
+    """
+    import processing
+    from . import CLASSIFICATION_FEATURES, DEFAULT_PARAMS
+
+    output = output or processing.MODEL_PATH
+    class_names = list(DEFAULT_CLASS_NAMES)
+    started = time.perf_counter()
+
+    paths, y = collect_dataset(root, class_names, labels_csv)
+    if len(np.unique(y)) < 2:
+        raise ValueError(
+            f"Dataset harus berisi gambar dari kelas {' dan '.join(class_names)} "
+            f"(ditemukan {len(paths)} gambar berlabel)"
+        )
+
+    extract_started = time.perf_counter()
+    X, errors, from_store = extract_dataset(paths, processes, store)
+    extract_seconds = time.perf_counter() - extract_started
+    valid = ~np.isnan(X).any(axis=1)
+    X, y = X[valid], y[valid]
+
+    model, metrics, fit_seconds = train_model(X, y, n_estimators, n_jobs, test_size, random_state)
+
+    trained_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    version = f"rf-{time.strftime('%Y%m%d-%H%M%S')}"
+    training = {
+        "images": len(paths),
+        "errors": len(errors),
+        "from_feature_store": from_store,
+        "class_counts": dict(zip(class_names, np.bincount(y, minlength=len(class_names)).tolist())),
+        "n_estimators": n_estimators,
+        "extract_seconds": round(extract_seconds, 3),
+        "fit_seconds": round(fit_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    save_model({
+        "model": model,
+        "class_names": class_names,
+        "version": version,
+        "trained_at": trained_at,
+        "metrics": metrics,
+        "feature_names": list(CLASSIFICATION_FEATURES),
+        # Parameter pipeline saat ekstraksi fitur (harus sama dengan serving)
+        "params": DEFAULT_PARAMS.to_dict(),
+        "training": training,
+    }, output)
+
+    return {
+        "version": version,
+        "output": output,
+        "metrics": metrics,
+        "training": training,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latih ulang model klasifikasi kayu (Random Forest).")
+    parser.add_argument("root", help="Folder dataset (subfolder Cacat / Tidak Cacat)")
+    parser.add_argument("-o", "--output", help="Path artifact model (default processing/wood_classifier_rf.pkl)")
+    parser.add_argument("--labels", help="CSV label (kolom path,label); default dari nama folder")
+    parser.add_argument("--processes", type=int, help="Jumlah proses ekstraksi fitur (default jumlah core)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Jumlah thread Random Forest (default semua core)")
+    parser.add_argument("--n-estimators", type=int, default=100, help="Jumlah pohon")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Porsi data uji")
+    parser.add_argument("--seed", type=int, default=42, help="Seed split dan model")
+    parser.add_argument("--store", default=os.environ.get("WOOD_FEATURE_STORE_DIR"),
+                        help="Folder feature store (default WOOD_FEATURE_STORE_DIR)")
+    args = parser.parse_args(argv)
+
+    from .feature_store import FeatureStore
+
+    try:
+        summary = run_training(
+            args.root,
+            output=args.output,
+            labels_csv=args.labels,
+            processes=args.processes,
+            n_jobs=args.n_jobs,
+            n_estimators=args.n_estimators,
+            test_size=args.test_size,
+            random_state=args.seed,
+            store=FeatureStore(args.store) if args.store else None,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    for image_path, error in summary.pop("errors").items():
+        print(f"{image_path}: {error}", file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
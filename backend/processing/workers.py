@@ -0,0 +1,198 @@
+"""
+Wood Knots Detection - Worker Pool
+
+Mode eksekusi paralel untuk modul processing. Tahap OpenCV dan inferensi
+dijalankan di process pool sehingga batch dan request tunggal yang datang
+bersamaan tersebar ke semua core. Setiap worker me-load model satu kali
+saat start.
+
+Ukuran pool diatur lewat configure_pool() atau environment variable
+WOOD_WORKER_POOL_SIZE:
+    0       -> nonaktif, semua dijalankan di thread request (default)
+    N       -> N proses worker
+    "auto"  -> jumlah core CPU
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+# Jumlah tugas yang sudah dikirim ke pool tetapi belum selesai
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+# True di dalam proses worker, supaya worker tidak membuat pool lagi
+_in_worker = False
+
+
+def resolve_pool_size(value):
+    """Ubah nilai konfigurasi (int, "0", "auto") menjadi jumlah worker."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value == "auto":
+            return os.cpu_count() or 1
+        value = int(value or 0)
+    if value < 0:
+        raise ValueError(f"Ukuran worker pool tidak valid: {value}")
+    return value
+
+
+def configure_pool(size):
+    """
+    Atur ukuran worker pool. Pool lama (jika ada) dimatikan; pool baru
+    dibuat saat pertama kali dipakai.
+    """
+    global _pool_size
+    size = resolve_pool_size(size)
+    with _pool_lock:
+        if size != _pool_size:
+            _shutdown_locked(wait=True)
+        _pool_size = size
+    return size
+
+
+def pool_size():
+    """Jumlah worker yang dikonfigurasi (0 jika nonaktif)."""
+    return _pool_size
+
+
+def queue_depth():
+    """Jumlah tugas di worker pool yang belum selesai (antre + berjalan)."""
+    return _in_flight
+
+
+def _track(future):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+
+    def done(_):
+        global _in_flight
+        with _in_flight_lock:
+            _in_flight -= 1
+
+    future.add_done_callback(done)
+    return future
+
+
+def is_enabled():
+    """True jika pekerjaan harus dikirim ke worker pool."""
+    return _pool_size > 0 and not _in_worker
+
+
+def get_pool():
+    """Ambil process pool, dibuat saat pertama kali dipanggil."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from .registry import model_registry
+            _pool = ProcessPoolExecutor(
+                max_workers=_pool_size or 1,
+                initializer=_init_worker,
+                # Worker ikut memantau file model jika proses induk memantau
+                initargs=(model_registry.watch_interval,)
+            )
+        return _pool
+
+
+def shutdown_pool(wait=True):
+    """Matikan worker pool (dipanggil saat server berhenti)."""
+    with _pool_lock:
+        _shutdown_locked(wait)
+
+
+def _shutdown_locked(wait):
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait)
+        _pool = None
+
+
+def _init_worker(model_watch_interval=0):
+    """
+    Initializer proses worker: load model sekali per proses dan, jika
+    diminta, jalankan watcher hot reload model di proses ini.
+    """
+    global _in_worker
+    _in_worker = True
+
+    from .registry import model_registry
+    try:
+        model_registry.get()
+    except FileNotFoundError:
+        # Model belum ada; ekstraksi fitur tetap bisa berjalan
+        pass
+    model_registry.start_watcher(model_watch_interval)
+
+
+def _classify_path(image_path, params=None):
+    # Cache dicek di proses induk, worker cukup menghitung hasilnya
+    from . import _classify_image_uncached
+    return _classify_image_uncached(image_path, params)
+
+
+def _inspect_path(image_path, params=None):
+    from . import _inspect_image_uncached
+    return _inspect_image_uncached(image_path, params)
+
+
+def _warm_worker(_):
+    from . import warm_up
+    try:
+        warm_up()
+    except FileNotFoundError:
+        pass
+    return os.getpid()
+
+
+def warm_up_pool():
+    """
+    Start proses worker dan jalankan warm_up() di dalamnya sebelum request
+    pertama datang.
+    
+    Returns:
+        Jumlah proses worker yang sudah di-warm-up (0 jika pool nonaktif)
+    """
+    if not is_enabled():
+        return 0
+    return len(set(get_pool().map(_warm_worker, range(_pool_size))))
+
+
+def extract_features_many(image_paths, params=None):
+    """
+    Ekstraksi 4 fitur klasifikasi untuk banyak gambar secara paralel.
+
+    Args:
+        image_paths: List path gambar
+        params: PipelineParams (default DEFAULT_PARAMS)
+
+    Returns:
+        List of (features, error) dengan urutan sama dengan image_paths
+    """
+    from . import try_extract_classification_features
+
+    if not image_paths:
+        return []
+    chunksize = max(1, len(image_paths) // (_pool_size * 4 or 1))
+    return list(get_pool().map(
+        try_extract_classification_features, image_paths, repeat(params, len(image_paths)),
+        chunksize=chunksize
+    ))
+
+
+def submit_classify(image_path, params=None):
+    """Kirim klasifikasi satu gambar ke worker pool, mengembalikan Future."""
+    return _track(get_pool().submit(_classify_path, image_path, params))
+
+
+def submit_inspect(image_path, params=None):
+    """Kirim fast path inspect_image ke worker pool, mengembalikan Future."""
+    return _track(get_pool().submit(_inspect_path, image_path, params))
@@ -0,0 +1,324 @@
+"""
+Penyimpanan persisten untuk backend Wood Knots Detection.
+
+ResultsStore menyimpan hasil /api/process (klasifikasi, fitur, deteksi)
+di SQLite. Gambar tiap tahap pipeline disimpan sebagai file di
+PROCESSED_FOLDER; database hanya menyimpan nama filenya.
+
+UploadIndex memetakan image_id ke path file upload beserta metadata,
+sehingga lookup gambar tidak perlu memeriksa filesystem.
+
+JobStore menyimpan status dan hasil job async per job_id, sehingga
+GET /api/jobs/<job_id> bisa dilayani oleh proses worker mana pun.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+_thread_local = threading.local()
+
+
+@contextmanager
+def connect(db_path):
+    """
+    Koneksi SQLite milik thread saat ini untuk satu operasi (commit otomatis).
+    
+    Koneksi dibuka sekali per thread dan dipakai ulang; membuka dan menutup
+    koneksi di setiap operasi memicu checkpoint WAL yang mahal.
+    """
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=30)
+        # Aman untuk mode WAL: commit tidak menunggu fsync setiap kali
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[db_path] = conn
+    with conn:
+        yield conn
+
+
+def write_file_atomic(path, data):
+    """
+    Tulis file lewat file sementara + os.replace.
+    
+    Pembaca tidak pernah melihat file setengah jadi, dan file lama tidak
+    di-truncate (truncate file yang baru ditulis memaksa flush di beberapa
+    filesystem).
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ResultsStore:
+    """Hasil processing per image_id di database SQLite."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    image_id   TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    payload    TEXT NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def save(self, image_id, payload):
+        """
+        Simpan (atau timpa) hasil untuk image_id.
+
+        Args:
+            image_id: ID gambar
+            payload: Dictionary hasil yang bisa di-serialize ke JSON.
+                Gambar harus sudah berupa nama file, bukan base64.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (image_id, created_at, payload) VALUES (?, ?, ?)",
+                (image_id, time.time(), json.dumps(payload))
+            )
+
+    def get(self, image_id):
+        """Ambil hasil tersimpan, None jika belum pernah diproses."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT created_at, payload FROM results WHERE image_id = ?",
+                (image_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[1])
+        payload["created_at"] = row[0]
+        return payload
+
+    def delete(self, image_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE image_id = ?", (image_id,))
+
+
+class JobStore:
+    """Status dan hasil job async per job_id di database SQLite."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id      TEXT PRIMARY KEY,
+                    status      TEXT NOT NULL,
+                    created_at  REAL NOT NULL,
+                    finished_at REAL,
+                    payload     TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def save(self, job):
+        """
+        Simpan (atau timpa) status job.
+
+        Args:
+            job: Dictionary status job (Job.to_dict()), bisa di-serialize ke JSON
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, created_at, finished_at, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job["job_id"], job["status"], job["created_at"], job["finished_at"], json.dumps(job))
+            )
+
+    def get(self, job_id):
+        """Status job, None jika tidak ada atau sudah dihapus."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def delete(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def prune(self, result_ttl, max_jobs, stale_after=None):
+        """
+        Hapus job selesai yang sudah melewati result_ttl detik, job yang
+        belum selesai setelah stale_after detik (proses pemiliknya mati),
+        lalu job selesai tertua jika jumlah job melebihi max_jobs.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (now - result_ttl,)
+            )
+            if stale_after is not None:
+                conn.execute(
+                    "DELETE FROM jobs WHERE finished_at IS NULL AND created_at < ?",
+                    (now - stale_after,)
+                )
+            excess = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - max_jobs
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM jobs WHERE job_id IN ("
+                    "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL "
+                    "ORDER BY finished_at LIMIT ?)",
+                    (excess,)
+                )
+
+
+class UploadIndex:
+    """
+    Index image_id -> path dan metadata file upload.
+    
+    Lookup dilayani dari dictionary di memori (O(1), tanpa stat file).
+    Setiap entri juga ditulis ke SQLite sehingga index tetap ada setelah
+    restart dan bisa dibaca oleh proses worker lain.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._entries = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS uploads (
+                    image_id   TEXT PRIMARY KEY,
+                    path       TEXT NOT NULL,
+                    filename   TEXT,
+                    width      INTEGER,
+                    height     INTEGER,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            rows = conn.execute(
+                "SELECT image_id, path, filename, width, height, created_at FROM uploads"
+            ).fetchall()
+        for row in rows:
+            self._entries[row[0]] = self._row_to_entry(row)
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    @staticmethod
+    def _row_to_entry(row):
+        return {
+            "image_id": row[0],
+            "path": row[1],
+            "filename": row[2],
+            "dimensions": {"width": row[3], "height": row[4]},
+            "created_at": row[5],
+        }
+
+    def add(self, image_id, path, filename=None, width=None, height=None):
+        """Daftarkan file upload baru."""
+        row = (image_id, path, filename, width, height, time.time())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads "
+                "(image_id, path, filename, width, height, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                row
+            )
+        with self._lock:
+            self._entries[image_id] = self._row_to_entry(row)
+
+    def get(self, image_id):
+        """
+        Ambil metadata upload, None jika tidak terdaftar.
+        
+        Entri yang ditambahkan proses lain dibaca dari SQLite lalu disimpan
+        di memori.
+        """
+        entry = self._entries.get(image_id)
+        if entry is not None:
+            return entry
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT image_id, path, filename, width, height, created_at "
+                "FROM uploads WHERE image_id = ?",
+                (image_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = self._row_to_entry(row)
+        with self._lock:
+            self._entries[image_id] = entry
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def step_filename(image_id, name, data):
+    """
+    Nama file gambar tahap pipeline di PROCESSED_FOLDER.
+    
+    Nama mengandung hash isi file sehingga file bersifat immutable: gambar
+    yang sama tidak perlu ditulis ulang saat diproses lagi.
+    """
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    return f"{image_id}_{name}_{digest}.jpg"
+
+
+def write_file_once(folder, filename, data):
+    """Tulis file (atomik) hanya jika belum ada; file content-addressed."""
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        write_file_atomic(path, data)
+    return filename
+
+
+def owned_step_filename(image_id, name, filename):
+    """
+    Nama file tahap milik image_id dengan isi yang sama seperti filename
+    (hash isi di akhir nama dipertahankan).
+    """
+    return f"{image_id}_{name}_{filename.rsplit('_', 1)[-1]}"
+
+
+def link_file_once(folder, source, filename):
+    """
+    Buat filename dengan isi yang sama seperti source di folder yang sama,
+    hanya jika belum ada.
+    
+    Dipakai hard link (tanpa menyalin data); jika filesystem tidak
+    mendukung, file disalin secara atomik. Menghapus source tidak
+    mempengaruhi filename.
+    
+    Raises:
+        FileNotFoundError: Jika source tidak ada
+    """
+    path = os.path.join(folder, filename)
+    source_path = os.path.join(folder, source)
+    try:
+        os.link(source_path, path)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        raise
+    except OSError:
+        with open(source_path, 'rb') as f:
+            write_file_atomic(path, f.read())
+    return filename
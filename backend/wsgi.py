@@ -0,0 +1,17 @@
+"""
+Entry point WSGI untuk server produksi.
+
+Contoh (dari folder backend):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Dengan preload_app (default di gunicorn.conf.py) modul ini diimport sekali
+di proses master: model di-load dan di-warm-up di sini lalu dibagi ke semua
+worker lewat copy-on-write. Watcher model, worker pool dan antrean job
+dimulai per worker setelah fork (lihat post_fork di gunicorn.conf.py).
+"""
+
+from app import app, preload_processing
+
+preload_processing()
+
+__all__ = ["app"]
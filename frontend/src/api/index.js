@@ -21,10 +21,11 @@ export async function uploadImage(file) {
 }
 
 /**
- * Proses gambar dengan pipeline PCD dan klasifikasi ML
+ * Proses gambar dengan pipeline PCD dan klasifikasi ML.
+ * Gambar tiap tahap dikembalikan sebagai URL (bukan base64) agar response kecil.
  */
 export async function processImage(imageId) {
-    const response = await fetch(`${API_BASE_URL}/process/${imageId}`, {
+    const response = await fetch(`${API_BASE_URL}/process/${imageId}?images=url`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
     });